@@ -0,0 +1,99 @@
+# ---
+# jupyter:
+#   jupytext:
+#     formats: ipynb,py:light
+#     text_representation:
+#       extension: .py
+#       format_name: light
+#       format_version: '1.4'
+#       jupytext_version: 1.1.7
+#   kernelspec:
+#     display_name: Python 3
+#     language: python
+#     name: python3
+# ---
+
+# Compare encoding and decoding typical DropBot payloads with the JSON backends
+# of `dropbot_monitor.codec` (i.e., `json_tricks` and, if installed, `orjson`).
+
+# +
+import time
+import timeit
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from dropbot_monitor.codec import JSON_BACKENDS, TricksJsonBackend
+
+print('Available JSON backends:', ', '.join(JSON_BACKENDS))
+
+# Payloads modelled on DropBot signals and property results.
+channels = np.zeros(120, dtype='uint8')
+channels[[3, 17, 42, 43, 44, 97]] = 1
+payloads = {
+    'capacitance-updated': {'event': 'capacitance-updated',
+                            'new_value': 3.85e-12, 'time_us': 1593469376,
+                            'n_samples': 50, 'V_a': 99.8, 'start': 15932341,
+                            'end': 15932346, '__sender__': 'dropbot-proxy',
+                            '__timestamp__': time.time()},
+    'channels-updated': {'event': 'channels-updated', 'n': 120,
+                         'actuated': np.where(channels)[0].tolist(),
+                         '__sender__': 'dropbot-proxy'},
+    'state_of_channels': channels,
+    'state': pd.Series({'capacitance_update_interval_ms': 25,
+                        'channel_count': 120, 'hv_output_enabled': True,
+                        'hv_output_selected': True, 'target_capacitance': 0.,
+                        'drops_update_interval_ms': 0, 'voltage': 100.,
+                        'frequency': 10e3, 'output_current_limit': 0.0015,
+                        'chip_load_range_margin': -1}),
+    'properties': pd.Series({'display_name': 'DropBot', 'url':
+                             'https://github.com/sci-bots/dropbot.py',
+                             'manufacturer': 'Sci-Bots Inc.',
+                             'package_name': 'dropbot',
+                             'software_version': '2.4.1',
+                             'base_node_software_version': '0.52.0'}),
+    'channel capacitances': pd.Series(np.random.rand(120) * 1e-12,
+                                      name='capacitance'),
+    'capacitance samples': {'__samples__': [{'new_value': v, 'V_a': 100.,
+                                             '__timestamp__': t}
+                                            for v, t in
+                                            zip(np.random.rand(50) * 1e-12,
+                                                time.time() +
+                                                np.arange(50) * 5e-3)]},
+    # UUIDs nested in containers must keep the `json_tricks` representation.
+    'uuid in dict': {'uuid': uuid.UUID(int=7)},
+    'uuid in series': pd.Series({'uuid': uuid.UUID(int=7),
+                                 'display_name': 'DropBot'}),
+}
+
+# Every backend must produce JSON readable by `json_tricks`, and read JSON
+# produced by `json_tricks` (i.e., objects decoded by either backend must have
+# the same `json_tricks` encoding).
+tricks = TricksJsonBackend()
+for name, payload in payloads.items():
+    for backend in JSON_BACKENDS.values():
+        for data in (tricks.dumps(payload), backend.dumps(payload)):
+            assert (tricks.dumps(backend.loads(data)) ==
+                    tricks.dumps(tricks.loads(data))), (backend.name, name)
+# -
+
+# +
+results = []
+for name, payload in payloads.items():
+    for backend in JSON_BACKENDS.values():
+        data = backend.dumps(payload)
+        for operation, function in (('encode',
+                                     lambda: backend.dumps(payload)),
+                                    ('decode', lambda: backend.loads(data))):
+            duration_s = min(timeit.repeat(function, number=200,
+                                           repeat=5)) / 200
+            results.append([name, backend.name, operation, 1e6 * duration_s])
+
+df_results = pd.DataFrame(results, columns=['payload', 'backend',
+                                            'operation', 'duration_us'])
+df_us = df_results.set_index(['payload', 'operation',
+                              'backend']).duration_us.unstack()
+if 'orjson' in df_us:
+    df_us['speed-up'] = df_us['json_tricks'] / df_us['orjson']
+df_us.round(1)
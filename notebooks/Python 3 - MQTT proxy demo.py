@@ -14,10 +14,6 @@
 # ---
 
 # +
-# Workaround https://github.com/jupyter/notebook/issues/3397
-import nest_asyncio
-nest_asyncio.apply()
-
 import sys
 print(sys.version)
 
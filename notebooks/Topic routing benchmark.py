@@ -0,0 +1,90 @@
+# ---
+# jupyter:
+#   jupytext:
+#     formats: ipynb,py:light
+#     text_representation:
+#       extension: .py
+#       format_name: light
+#       format_version: '1.4'
+#       jupytext_version: 1.1.7
+#   kernelspec:
+#     display_name: Python 3
+#     language: python
+#     name: python3
+# ---
+
+# Compare routing incoming topics through `dropbot_monitor.mqtt_router.TopicRouter`
+# against the per-message regular expression matching previously used by
+# `mqtt_bridge.on_message` and `mqtt_proxy.on_message`.
+
+# +
+import itertools as it
+import random
+import re
+import timeit
+
+from dropbot_monitor.mqtt_router import TopicRouter
+
+# Regular expressions previously used by `mqtt_bridge` and `mqtt_proxy`.
+cre_request = re.compile(r'^/(?P<device_name>[^/]+)/(?P<uuid>[^/]+)/'
+                         r'(?P<type>signal|property|call|priority-call|batch|'
+                         r'result)/'
+                         r'(?P<name>[^/]+)$')
+cre_signal = re.compile(r'^/[^/]+/(?P<uuid>[^/]+)/signal/'
+                        r'(?P<signalname>[^/]+)$')
+cre_properties = re.compile(r'^/[^/]+/(?P<uuid>[^/]+)/properties')
+
+REQUEST_TYPES = ('call', 'priority-call', 'property', 'batch')
+
+router = TopicRouter()
+for type_ in REQUEST_TYPES:
+    router.add('/+/+/%s/+' % type_, type_)
+router.add('/+/+/properties', 'properties')
+router.add('/+/+/signal/+', 'signal')
+
+# Mix of topics seen by a client subscribed to `/dropbot/+/#`.
+uuids = ['%032x' % random.getrandbits(128) for i in range(4)]
+topics = (['/dropbot/%s/signal/%s' % (uuid_, name)
+           for uuid_, name in it.product(uuids, ['capacitance-updated',
+                                                 'channels-updated',
+                                                 'shorts-detected'])] +
+          ['/dropbot/%s/%s/%s' % (uuid_, type_, name)
+           for uuid_, type_, name in it.product(uuids, REQUEST_TYPES +
+                                                ('result', ),
+                                                ['voltage', 'frequency'])] +
+          ['/dropbot/%s/properties' % uuid_ for uuid_ in uuids])
+messages = [random.choice(topics) for i in range(100000)]
+
+
+def regex_path(topics, name='dropbot'):
+    for topic in topics:
+        if not topic.startswith('/' + name):
+            continue
+        match = cre_properties.match(topic)
+        if match:
+            continue
+        match = cre_signal.match(topic) or cre_request.match(topic)
+
+
+def router_path(topics, name='dropbot', memoize=True):
+    # Trie lookup without memoized routes, for comparison.
+    route = router.route if memoize else router._route
+    for topic in topics:
+        type_, levels = route(topic)
+        if type_ is None or levels[0] != name:
+            continue
+
+
+# Both paths must agree on which topics are handled.
+assert ([bool(cre_properties.match(t) or cre_signal.match(t) or
+              (cre_request.match(t) and
+               cre_request.match(t).group('type') in REQUEST_TYPES))
+         for t in topics] == [router.route(t)[0] is not None for t in topics])
+
+for label, function in (('regex', regex_path),
+                        ('trie', lambda topics:
+                         router_path(topics, memoize=False)),
+                        ('router', router_path)):
+    duration_s = min(timeit.repeat(lambda: function(messages), number=1,
+                                   repeat=5))
+    print('%-8s %8.0f messages/s' % (label, len(messages) / duration_s))
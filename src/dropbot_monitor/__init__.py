@@ -6,4 +6,5 @@ del get_versions
 
 from .blinker_mqtt import *
 from .mqtt_async import *
+from .mqtt_rpc import *
 from .mqtt_bridge import *
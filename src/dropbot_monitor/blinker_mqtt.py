@@ -1,16 +1,437 @@
 from __future__ import (absolute_import, division, print_function,
                         unicode_literals)
+from collections import Counter, deque
+import functools as ft
+import heapq
+import itertools as it
+import re
+import threading
+import time
 
 from logging_helpers import _L
-import json_tricks as json
+import numpy as np
 import trollius as asyncio
 
+from .codec import decode, encode
+from .mqtt_rpc import is_request_id
 
-__all__ = ['bind', 'unbind']
+
+__all__ = ['SNAPSHOT', 'add_local_receiver', 'bind',
+           'remove_local_receiver', 'unbind', 'unpack_samples']
+
+#: Signal name used to request (and reply with) a snapshot of the most recent
+#: payload of each retained signal (see ``retain`` argument of :func:`bind`).
+SNAPSHOT = '__snapshot__'
+
+# Namespaces bound in this process, by connect topic.
+_local_namespaces = {}
+_local_lock = threading.Lock()
+
+
+def add_local_receiver(connect_topic, receiver):
+    '''
+    Receive signals of a namespace bound in this process directly, i.e.,
+    without serialization or a round trip through the MQTT broker.
+
+    Parameters
+    ----------
+    connect_topic : str
+        Topic prefix signals are published to, e.g.,
+        ``/dropbot/<uuid>/signal``.
+    receiver : function
+        Called as ``receiver(signal_name, payload)`` for each signal sent,
+        where ``payload`` holds the original keyword arguments of the signal
+        (and ``__sender__``, as for payloads published to MQTT).
+
+    Returns
+    -------
+    bool
+        ``True`` if a namespace is bound to ``connect_topic`` in this process
+        (i.e., receiver was added).
+    '''
+    with _local_lock:
+        signals = _local_namespaces.get(connect_topic.rstrip('/'))
+        if signals is None:
+            return False
+        signals._local_receivers = signals._local_receivers + [receiver]
+        return True
+
+
+def remove_local_receiver(connect_topic, receiver):
+    '''
+    Remove receiver added by :func:`add_local_receiver` (if namespace is
+    still bound).
+    '''
+    with _local_lock:
+        signals = _local_namespaces.get(connect_topic.rstrip('/'))
+        if signals is not None:
+            signals._local_receivers = [r for r in signals._local_receivers
+                                        if r is not receiver]
+
+
+class WindowScheduler(object):
+    '''
+    Call functions once their deadline has passed, from a single
+    long-lived thread (i.e., rather than starting a timer thread for each
+    sample window).
+
+    The thread is started on the first call to :meth:`schedule`.
+    '''
+    def __init__(self):
+        self._heap = []
+        self._sequence = it.count()
+        self._condition = threading.Condition()
+        self.thread = None
+
+    def schedule(self, delay_s, function):
+        '''
+        Parameters
+        ----------
+        delay_s : float
+            Delay in seconds.
+        function : function
+            Called (from the scheduler thread) once ``delay_s`` has elapsed.
+        '''
+        with self._condition:
+            heapq.heappush(self._heap, (time.time() + delay_s,
+                                        next(self._sequence), function))
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run)
+                self.thread.daemon = True
+                self.thread.start()
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while True:
+                    timeout = (self._heap[0][0] - time.time() if self._heap
+                               else None)
+                    if timeout is not None and timeout <= 0:
+                        break
+                    self._condition.wait(timeout)
+                function = heapq.heappop(self._heap)[-1]
+            try:
+                function()
+            except Exception:
+                _L().error('error in scheduled function', exc_info=True)
+
+
+_scheduler = WindowScheduler()
+
+
+class SampleWindow(object):
+    '''
+    Collect signal payloads over a time window and flush them together.
+
+    The first payload added starts a window; once the window has elapsed, all
+    payloads added during the window are passed to ``flush`` as a list.
+
+    Parameters
+    ----------
+    window_s : float
+        Window duration in seconds.
+    flush : function
+        Called (from the thread of ``scheduler``) with the list of payloads in
+        window.
+    latest : bool, optional
+        If ``True``, only keep the most recent payload in window.
+    scheduler : WindowScheduler, optional
+        Scheduler used to flush elapsed windows (default: a scheduler shared
+        by all windows in this process).
+    '''
+    def __init__(self, window_s, flush, latest=False, scheduler=None):
+        self.window_s = window_s
+        self.latest = latest
+        self._flush = flush
+        self._scheduler = _scheduler if scheduler is None else scheduler
+        self._lock = threading.Lock()
+        self._samples = []
+        # Token identifying the open window (if any).
+        self._window = None
+
+    def add(self, payload):
+        with self._lock:
+            if self.latest:
+                self._samples = [payload]
+            else:
+                self._samples.append(payload)
+            if self._window is None:
+                self._window = object()
+                self._scheduler.schedule(self.window_s,
+                                         ft.partial(self._expire,
+                                                    self._window))
+
+    def _expire(self, window):
+        with self._lock:
+            if window is not self._window:
+                # Window was already flushed.
+                return
+            samples, self._samples = self._samples, []
+            self._window = None
+        if samples:
+            self._flush(samples)
+
+    def flush(self):
+        '''
+        Flush payloads collected so far (if any).
+        '''
+        with self._lock:
+            samples, self._samples = self._samples, []
+            self._window = None
+        if samples:
+            self._flush(samples)
+
+
+#: Publish queue overflow policies (see :class:`PublishQueue`).
+OVERFLOW_POLICIES = ('block', 'drop-oldest', 'drop-newest')
+
+
+class PublishQueue(object):
+    '''
+    Bounded queue of signal payloads, encoded and published by a background
+    thread.
+
+    Decouples signal senders (e.g., the DropBot monitor loop) from payload
+    serialization and from the MQTT client outbound buffer.
+
+    When the queue is full, a payload is handled according to the overflow
+    policy of its signal:
+
+     - ``block``: wait until the queue has room;
+     - ``drop-oldest``: drop the oldest queued payload of the same signal to
+       make room (or, if none is queued, drop the new payload);
+     - ``drop-newest``: drop the new payload.
+
+    Parameters
+    ----------
+    maxsize : int
+        Maximum number of queued payloads.
+    '''
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        #: Counters, e.g., ``published``, ``dropped``, ``dropped:<signal>``.
+        self.stats = Counter()
+        self.max_depth = 0
+        self._items = deque()
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._closed = False
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    @property
+    def depth(self):
+        return len(self._items)
+
+    def metrics(self):
+        '''
+        Returns
+        -------
+        dict
+            Current and maximum queue depth, queue capacity, and counters.
+        '''
+        with self._lock:
+            return dict(self.stats, depth=len(self._items),
+                        max_depth=self.max_depth, maxsize=self.maxsize)
+
+    def put(self, name, publish, payload, overflow='block'):
+        '''
+        Parameters
+        ----------
+        name : str
+            Signal name.
+        publish : function
+            Called (from the queue thread) with ``payload`` to encode and
+            publish it.
+        payload : dict
+        overflow : str, optional
+            One of :data:`OVERFLOW_POLICIES`.
+
+        Raises
+        ------
+        RuntimeError
+            If queue is closed (including while waiting for room).
+        '''
+        with self._lock:
+            if self._closed:
+                raise RuntimeError('publish queue is closed')
+            if len(self._items) >= self.maxsize:
+                if overflow == 'block':
+                    while len(self._items) >= self.maxsize and \
+                            not self._closed:
+                        self._not_full.wait()
+                    if self._closed:
+                        # Closed while waiting; queue thread has exited.
+                        raise RuntimeError('publish queue is closed')
+                elif overflow == 'drop-oldest' and \
+                        self._remove_oldest(name):
+                    self._drop(name)
+                else:
+                    self._drop(name)
+                    return
+            self._items.append((name, publish, payload))
+            self.max_depth = max(self.max_depth, len(self._items))
+            self._not_empty.notify()
+
+    def _remove_oldest(self, name):
+        for item in self._items:
+            if item[0] == name:
+                self._items.remove(item)
+                return True
+        return False
+
+    def _drop(self, name):
+        self.stats['dropped'] += 1
+        self.stats['dropped:' + name] += 1
+
+    def close(self):
+        '''
+        Publish queued payloads and stop queue thread.
+        '''
+        with self._lock:
+            self._closed = True
+            self._not_empty.notify()
+            # Wake senders waiting for room.
+            self._not_full.notify_all()
+        self.thread.join()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._items and not self._closed:
+                    self._not_empty.wait()
+                if not self._items:
+                    break
+                name, publish, payload = self._items.popleft()
+                self._not_full.notify()
+            publish(payload)
+            with self._lock:
+                self.stats['published'] += 1
+        _L().debug('stopped publish queue')
+
+
+cre_policy = re.compile(r'^(?P<policy>all|on-change-only|'
+                        r'latest-every-(?P<interval_ms>\d+(\.\d*)?)-ms|'
+                        r'max-rate-(?P<rate_hz>\d+(\.\d*)?)-hz)$')
+
+
+def payloads_equal(a, b):
+    '''
+    Returns
+    -------
+    bool
+        ``True`` if payloads have the same fields and values, ignoring the
+        ``__sender__`` and ``__timestamp__`` fields.
+    '''
+    ignore = ('__sender__', '__timestamp__')
+    keys = set(a) - set(ignore)
+    if keys != set(b) - set(ignore):
+        return False
+    for key in keys:
+        x, y = a[key], b[key]
+        try:
+            if hasattr(x, 'equals'):
+                # pandas objects.
+                equal = type(x) is type(y) and x.equals(y)
+            elif isinstance(x, np.ndarray) or isinstance(y, np.ndarray):
+                equal = np.array_equal(x, y)
+            else:
+                equal = bool(x == y)
+        except Exception:
+            equal = False
+        if not equal:
+            return False
+    return True
+
+
+def decimate(policy, forward, windows=None):
+    '''
+    Parameters
+    ----------
+    policy : str
+        One of:
+
+         - ``all``: forward every payload;
+         - ``on-change-only``: forward payloads which differ from the
+           previously forwarded payload (see :func:`payloads_equal`);
+         - ``latest-every-<N>-ms``: forward the most recent payload (if any)
+           at most once every ``N`` milliseconds, dropping older payloads;
+         - ``max-rate-<N>-hz``: forward payloads at most ``N`` times per
+           second, dropping payloads sent in between.
+    forward : function
+        Called with each forwarded payload.
+    windows : list, optional
+        List to append any window opened by the policy to (e.g., to flush on
+        unbind).
+
+    Returns
+    -------
+    function
+        Called with each payload; calls ``forward`` according to policy.
+    '''
+    match = cre_policy.match(policy)
+    if match is None:
+        raise ValueError('Invalid decimation policy: `%s`' % policy)
+    elif policy == 'all':
+        return forward
+    elif policy == 'on-change-only':
+        state = {}
+
+        def _on_change(payload):
+            previous = state.get('payload')
+            if previous is None or not payloads_equal(previous, payload):
+                state['payload'] = payload
+                forward(payload)
+        return _on_change
+    elif match.group('interval_ms'):
+        window = SampleWindow(float(match.group('interval_ms')) * 1e-3,
+                              lambda samples: forward(samples[-1]),
+                              latest=True)
+        if windows is not None:
+            windows.append(window)
+        return window.add
+    else:
+        period_s = 1. / float(match.group('rate_hz'))
+        state = {'time': None}
+
+        def _max_rate(payload):
+            now = time.time()
+            if state['time'] is None or now - state['time'] >= period_s:
+                state['time'] = now
+                forward(payload)
+        return _max_rate
+
+
+def unpack_samples(payload):
+    '''
+    Unpack signal payload published by a signal with a batching window (see
+    ``batch`` argument of :func:`bind`).
+
+    Parameters
+    ----------
+    payload : dict
+        Decoded payload.
+
+    Returns
+    -------
+    list
+        Payload of each signal sent, i.e., ``[payload]`` if ``payload`` does
+        not contain a batch of samples.  Each sample of a batch has a
+        ``__timestamp__`` field set to the time the signal was sent (seconds
+        since the epoch).
+    '''
+    if isinstance(payload, dict) and '__samples__' in payload:
+        return payload['__samples__']
+    return [payload]
 
 
 def bind(signals, paho_client, connect_topic='/signal',
-         send_topic='/signal-send'):
+         send_topic='/signal-send', codec='json', batch=None,
+         policies=None, queue_size=None, overflow=None, loopback=False,
+         allow_create=None, transforms=None, retain=None, remote=True):
     '''
     Bind a blinker signals namespace to a Paho MQTT client.
 
@@ -19,7 +440,66 @@ def bind(signals, paho_client, connect_topic='/signal',
     ``<send_topic>/<signalname>`` is sent to the corresponding ``<signalname>``
     blinker signal.
 
-    Note that MQTT message payloads are encoded/decoded as JSON.
+    A single MQTT callback (for ``<send_topic>/+``) dispatches received
+    messages to the corresponding signal by name.  Messages for a signal not
+    in the namespace are ignored, unless the signal name is allowed to be
+    created on demand (see ``allow_create``).
+
+    Note that MQTT message payloads are encoded as JSON by default.  Received
+    payloads may be encoded using any registered codec (see
+    :mod:`dropbot_monitor.codec`).
+
+    Signals sent at a high rate (e.g., ``capacitance-updated``) may be
+    assigned a batching window (see ``batch``), in which case all payloads
+    sent within each window are published together in a single message, i.e.,
+    ``{"__samples__": [<payload>, ...]}``, where each payload has a
+    ``__timestamp__`` field set to the time the signal was sent.  Use
+    :func:`unpack_samples` to unpack received payloads.
+
+    Payloads of a signal may be transformed before they are encoded (see
+    ``transforms``), e.g., to encode ``channels-updated`` payloads compactly
+    using a :class:`dropbot_monitor.channels.ChannelsEncoder`.
+
+    The most recent payload of selected signals (see ``retain``) is published
+    as a retained message, so clients subscribing later (e.g., a client
+    connecting mid-run) immediately receive the current value.  The most
+    recent payloads are also kept in ``signals.last_values``; a message
+    published to ``<send_topic>/__snapshot__`` (see :data:`SNAPSHOT`) is
+    answered with a single message mapping each signal name to its most
+    recent payload, published to ``<connect_topic>/__snapshot__/<id>`` if the
+    request payload has a correlation ID (i.e., ``{"__id__": <id>}``, see
+    :func:`dropbot_monitor.mqtt_rpc.is_request_id`), so that only the
+    requester receives it (otherwise, to ``<connect_topic>/__snapshot__``).
+    Retained messages are cleared by :func:`unbind`.  For a signal with a
+    batching window, the most recent payload of each window is published
+    separately (i.e., not in the ``__samples__`` batch) as the retained
+    message.
+
+    Subscribers in the same process may receive signals directly (see
+    :func:`add_local_receiver`), i.e., as the original Python objects.  Note
+    that subscribers in other processes are not tracked (MQTT does not report
+    subscribers to publishers), so signals are still serialized and
+    published to MQTT unless publishing is disabled explicitly (see
+    ``remote``), e.g., when all subscribers are known to run in this
+    process.  Publishing may be toggled while bound through
+    ``signals.remote``.
+
+    Consumers only interested in, e.g., the most recent value of a signal may
+    assign a decimation policy to the signal (see ``policies`` and
+    :func:`decimate`).  Policies are applied before payloads are encoded, so
+    dropped payloads are never serialized.
+
+    If ``queue_size`` is set, payloads are encoded and published by a
+    background thread draining a bounded queue (see :class:`PublishQueue`),
+    so senders are not slowed down by serialization or by the MQTT client.
+    Queue depth metrics are available through
+    ``signals.publish_queue.metrics()`` while bound.
+
+    Signals sent in response to a message received at ``<send_topic>/...``
+    are tagged with the topic of the message (i.e., the ``__topic__``
+    keyword argument) and, by default, are not published back to
+    ``<connect_topic>/...`` (see ``loopback``).  Suppressed echoes are
+    counted in ``signals.stats['suppressed-echoes']`` while bound.
 
 
     Parameters
@@ -31,6 +511,41 @@ def bind(signals, paho_client, connect_topic='/signal',
     send_topic : str
         Topic prefix for MQTT subscriptions which result in sending the
         corresponding signal to the ``blinker`` namespace.
+    codec : str, optional
+        Content type used to encode signals published to MQTT, e.g.,
+        ``msgpack`` (default: ``json``).
+    batch : dict, optional
+        Mapping from signal name to batching window in milliseconds, e.g.,
+        ``{'capacitance-updated': 100}``.
+    policies : dict, optional
+        Mapping from signal name to decimation policy (see :func:`decimate`),
+        e.g., ``{'capacitance-updated': 'latest-every-250-ms'}`` (default:
+        ``all``).
+    queue_size : int, optional
+        Maximum number of payloads queued for publishing (default: publish
+        from the thread sending each signal).
+    overflow : dict, optional
+        Mapping from signal name to publish queue overflow policy (see
+        :data:`OVERFLOW_POLICIES`; default: ``block``).
+    loopback : bool or list, optional
+        If ``True`` (or, for a list of signal names, for the listed signals),
+        publish signals sent in response to messages received at
+        ``<send_topic>/...`` to ``<connect_topic>/...``, as any other signal.
+    allow_create : bool or list, optional
+        If ``True`` (or, for a list of signal names, for the listed signals),
+        create signal on demand when a message is received at
+        ``<send_topic>/<signalname>`` for a signal not in the namespace.
+    transforms : dict, optional
+        Mapping from signal name to function called with each payload (after
+        any decimation policy is applied); returns payload to publish.
+    retain : list, optional
+        Names of signals for which the most recent payload is published as a
+        retained message and included in snapshots.
+    remote : bool, optional
+        If ``False``, do not publish (or serialize) signals to MQTT, i.e., only
+        deliver signals to receivers in this process.  This is the only
+        switch: publishing is *not* disabled automatically when all
+        subscribers are in this process.
     '''
     if hasattr(signals, 'paho_client'):
         raise RuntimeError('signals already bound to client with ID: `%s`' %
@@ -44,6 +559,33 @@ def bind(signals, paho_client, connect_topic='/signal',
     signals._signal = signals.signal
     signals._blinker_receivers = []
     signals._mqtt_callbacks = set()
+    # Callbacks sending received MQTT messages to signals, by signal name.
+    signals._senders = {}
+    signals._windows = []
+    # Receivers in this process (see `add_local_receiver()`).
+    signals._local_receivers = []
+    signals.stats = Counter()
+    batch = batch or {}
+    policies = policies or {}
+    transforms = transforms or {}
+    signals.retain = frozenset(retain or tuple())
+    #: If ``False``, signals are only delivered to receivers in this process.
+    signals.remote = remote
+    #: Most recent payload sent for each retained signal (after any decimation
+    #: policy and transform are applied).
+    signals.last_values = {}
+    # Validate policies before binding any signal.
+    for name, policy in policies.items():
+        if not cre_policy.match(policy):
+            raise ValueError('Invalid decimation policy for `%s`: `%s`' %
+                             (name, policy))
+    overflow = overflow or {}
+    for name, policy in overflow.items():
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError('Invalid overflow policy for `%s`: `%s`' %
+                             (name, policy))
+    signals.publish_queue = (PublishQueue(queue_size) if queue_size else
+                             None)
 
     def signal(name, doc=None):
         bind_required = (name not in signals)
@@ -53,20 +595,80 @@ def bind(signals, paho_client, connect_topic='/signal',
         return signal
 
     def bind_signal(signal, name):
-        @asyncio.coroutine
-        def mqtt_publish(sender_name, **payload):
-            # Connect callback to `signal` -> publish to MQTT `connect_topic`
-            topic = '/'.join([connect_topic.rstrip('/'), name])
+        topic = '/'.join([send_topic.rstrip('/'), name])
+        echo = (loopback if isinstance(loopback, bool) else
+                name in loopback)
 
+        retained = name in signals.retain
+
+        def _publish(payload, retain=False):
             try:
-                payload['__sender__'] = sender_name
-                message = json.dumps(payload, default=lambda o: '<not serializable>')
-                paho_client.publish(topic, payload=message)
+                message = encode(payload, codec,
+                                 default=lambda o: '<not serializable>')
+                paho_client.publish('/'.join([connect_topic.rstrip('/'),
+                                              name]), payload=message,
+                                    retain=retain)
             except Exception:
                 _L().error('error publishing message; payload=`%s`, '
                            'signal=`%s`', payload, name,
                            exc_info=True)
 
+        if signals.publish_queue is None:
+            publish = _publish
+        else:
+            def publish(payload, retain=False):
+                signals.publish_queue.put(name, ft.partial(_publish,
+                                                           retain=retain),
+                                          payload,
+                                          overflow.get(name, 'block'))
+
+        if name in batch:
+            def publish_samples(samples):
+                if retained:
+                    # Retain the most recent sample rather than the batch, so
+                    # late subscribers do not receive stale samples.
+                    samples, last = samples[:-1], samples[-1]
+                if samples:
+                    publish({'__samples__': samples})
+                if retained:
+                    publish(last, retain=True)
+
+            window = SampleWindow(batch[name] * 1e-3, publish_samples)
+            signals._windows.append(window)
+            forward = window.add
+        else:
+            forward = ft.partial(publish, retain=retained)
+        if retained:
+            def forward(payload, forward=forward):
+                signals.last_values[name] = payload
+                forward(payload)
+        if name in transforms:
+            forward = (lambda transform, forward: lambda payload:
+                       forward(transform(payload)))(transforms[name], forward)
+        forward = decimate(policies.get(name, 'all'), forward,
+                           signals._windows)
+
+        @asyncio.coroutine
+        def mqtt_publish(sender_name, **payload):
+            # Connect callback to `signal` -> publish to MQTT `connect_topic`
+            if not echo and payload.get('__topic__') == topic:
+                # Signal sent by `blinker_send` below, i.e., originated from
+                # MQTT.
+                signals.stats['suppressed-echoes'] += 1
+                return
+            payload['__sender__'] = sender_name
+            for receiver in signals._local_receivers:
+                try:
+                    receiver(name, dict(payload))
+                except Exception:
+                    _L().error('error in local receiver; signal=`%s`', name,
+                               exc_info=True)
+            if not signals.remote:
+                return
+            if name in batch:
+                payload['__timestamp__'] = time.time()
+            forward(payload)
+
         signal.connect(mqtt_publish, weak=False)
         signals._blinker_receivers.append((name, mqtt_publish))
 
@@ -85,21 +687,60 @@ def bind(signals, paho_client, connect_topic='/signal',
             '''
             signals._most_recent_message = message
             try:
-                payload = json.loads(message.payload)
-                signal.send(paho_client._client_id, __topic__=topic, **payload)
+                for payload in unpack_samples(decode(message.payload)):
+                    signal.send(paho_client._client_id, __topic__=topic,
+                                **payload)
             except Exception:
                 _L().error('error sending message; payload=`%s`, '
                            'signal=`%s`', message.payload, name,
                            exc_info=True)
 
-        topic = '/'.join([send_topic.rstrip('/'), name])
-        paho_client.message_callback_add(topic, blinker_send)
-        signals._mqtt_callbacks.add(topic)
+        signals._senders[name] = blinker_send
         return signal
 
+    def on_send_message(client, userdata, message):
+        name = message.topic.rsplit('/', 1)[-1]
+        if name == SNAPSHOT:
+            try:
+                request = decode(message.payload) if message.payload else {}
+            except Exception:
+                request = {}
+            request_id = (request.get('__id__')
+                          if isinstance(request, dict) else None)
+            publish_snapshot(request_id if is_request_id(request_id)
+                             else None)
+            return
+        blinker_send = signals._senders.get(name)
+        if blinker_send is None:
+            if not (allow_create is True or
+                    name in (allow_create or tuple())):
+                signals.stats['unknown-signals'] += 1
+                _L().debug('ignore message for unknown signal: `%s`', name)
+                return
+            # Create (and bind) signal.
+            signals.signal(name)
+            blinker_send = signals._senders[name]
+        blinker_send(client, userdata, message)
+
+    def publish_snapshot(request_id=None):
+        levels = [connect_topic.rstrip('/'), SNAPSHOT]
+        if request_id is not None:
+            levels.append(request_id)
+        try:
+            message = encode(dict(signals.last_values), codec,
+                             default=lambda o: '<not serializable>')
+            paho_client.publish('/'.join(levels), payload=message)
+        except Exception:
+            _L().error('error publishing snapshot', exc_info=True)
+
+    topic = '/'.join([send_topic.rstrip('/'), '+'])
+    paho_client.message_callback_add(topic, on_send_message)
+    signals._mqtt_callbacks.add(topic)
     signals.signal = signal
     for signal in signals:
         bind_signal(signals[signal], signal)
+    with _local_lock:
+        _local_namespaces[connect_topic.rstrip('/')] = signals
     return signals
 
 
@@ -118,19 +759,42 @@ def unbind(signals):
     '''
     if not hasattr(signals, 'paho_client'):
         raise RuntimeError('signals was not bound to a Paho MQTT client.')
+    with _local_lock:
+        if _local_namespaces.get(signals.connect_topic
+                                 .rstrip('/')) is signals:
+            del _local_namespaces[signals.connect_topic.rstrip('/')]
     # Remove MQTT messages callback
     for sub in sorted(signals._mqtt_callbacks):
         signals.paho_client.message_callback_remove(sub)
     # Disconnect blinker callbacks
     for name, callback in signals._blinker_receivers:
         signals.signal(name).disconnect(callback)
+    # Publish payloads held in any open window (in reverse order, since a
+    # decimation window forwards to the batching window of the same signal).
+    for window in reversed(signals._windows):
+        window.flush()
+    if signals.publish_queue is not None:
+        signals.publish_queue.close()
+    # Clear retained messages.
+    for name in sorted(signals.retain):
+        signals.paho_client.publish('/'.join([signals.connect_topic
+                                              .rstrip('/'), name]),
+                                    payload=None, retain=True)
     # Restore original `signal()` method.
     signals.signal = signals._signal
     # Remove custom attributes added by `bind()`.
     del signals._blinker_receivers
     del signals._most_recent_message
     del signals._mqtt_callbacks
+    del signals._senders
     del signals._signal
+    del signals._windows
+    del signals._local_receivers
+    del signals.stats
+    del signals.publish_queue
+    del signals.retain
+    del signals.remote
+    del signals.last_values
     del signals.connect_topic
     del signals.paho_client
     del signals.send_topic
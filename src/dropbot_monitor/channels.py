@@ -0,0 +1,174 @@
+'''
+Compact encoding of ``channels-updated`` signal payloads.
+
+By default, each ``channels-updated`` payload carries the full list of
+actuated channels (i.e., the ``actuated`` field).  A
+:class:`ChannelsEncoder` replaces the list with a ``__channels__`` field
+containing:
+
+ - ``size``: number of channels in bitmap;
+ - ``bitmap``: base64-encoded fixed-width bitmap of channel states, where
+   channel ``i`` is bit ``i % 8`` of byte ``i // 8``;
+ - ``seq``: sequence number of the payload;
+ - ``added``, ``removed``: (optional) channels actuated and deactuated since
+   the previous payload.
+
+Since the bitmap describes the complete channel state, consumers which miss
+a payload (i.e., see a gap in sequence numbers) still reconstruct the state
+from the next payload (see :class:`ChannelsDecoder`).
+
+Example
+-------
+
+>>> bind(signals, client, ..., transforms={'channels-updated':
+...                                         ChannelsEncoder(120)})
+>>> decoder = ChannelsDecoder()
+>>> decoder.update(payload)
+{0, 5, 17}
+'''
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+import base64
+import itertools as it
+import threading
+
+
+__all__ = ['ChannelsDecoder', 'ChannelsEncoder', 'decode_bitmap',
+           'encode_bitmap']
+
+
+def encode_bitmap(channels, size):
+    '''
+    Parameters
+    ----------
+    channels : set
+        Actuated channel numbers.
+    size : int
+        Number of channels in bitmap (i.e., at least ``max(channels) + 1``).
+
+    Returns
+    -------
+    str
+        Base64-encoded bitmap of channel states.
+    '''
+    bitmap = bytearray((size + 7) // 8)
+    for channel in channels:
+        bitmap[channel >> 3] |= 1 << (channel & 7)
+    return base64.b64encode(bytes(bitmap)).decode('ascii')
+
+
+def decode_bitmap(bitmap):
+    '''
+    Parameters
+    ----------
+    bitmap : str
+        Base64-encoded bitmap of channel states (see :func:`encode_bitmap`).
+
+    Returns
+    -------
+    set
+        Actuated channel numbers.
+    '''
+    channels = set()
+    for i, byte in enumerate(bytearray(base64.b64decode(bitmap))):
+        while byte:
+            bit = byte & -byte
+            channels.add(8 * i + bit.bit_length() - 1)
+            byte ^= bit
+    return channels
+
+
+class ChannelsEncoder(object):
+    '''
+    Signal payload transform replacing the ``actuated`` list of a
+    ``channels-updated`` payload with a compact ``__channels__`` field (see
+    :mod:`dropbot_monitor.channels`).
+
+    Parameters
+    ----------
+    size : int, optional
+        Number of channels (default: highest actuated channel number seen,
+        rounded up to a multiple of 8).  Bitmap is extended if a higher
+        channel number is actuated.
+    diff : bool, optional
+        If ``True``, include channels actuated and deactuated since the
+        previous payload.
+    '''
+    def __init__(self, size=None, diff=True):
+        self.size = size or 0
+        self.diff = diff
+        self._lock = threading.Lock()
+        self._sequence = it.count()
+        self._previous = None
+
+    def __call__(self, payload):
+        '''
+        Parameters
+        ----------
+        payload : dict
+            Signal payload.
+
+        Returns
+        -------
+        dict
+            Copy of payload with the ``actuated`` list replaced by a
+            ``__channels__`` field (or ``payload`` if it has no ``actuated``
+            field).
+        '''
+        if 'actuated' not in payload:
+            return payload
+        payload = dict(payload)
+        channels = set(int(channel) for channel in payload.pop('actuated'))
+        with self._lock:
+            if channels:
+                self.size = max(self.size, (max(channels) + 8) // 8 * 8)
+            state = {'size': self.size,
+                     'bitmap': encode_bitmap(channels, self.size),
+                     'seq': next(self._sequence)}
+            if self.diff and self._previous is not None:
+                state['added'] = sorted(channels - self._previous)
+                state['removed'] = sorted(self._previous - channels)
+            self._previous = channels
+        payload['__channels__'] = state
+        return payload
+
+
+class ChannelsDecoder(object):
+    '''
+    Reconstruct the set of actuated channels from ``channels-updated``
+    payloads.
+
+    Differences are applied to the previous state when payloads are received
+    in sequence; otherwise, the state is decoded from the bitmap.  Payloads
+    with a plain ``actuated`` list are also supported.
+    '''
+    def __init__(self):
+        #: Actuated channels (``None`` until the first payload is received).
+        self.actuated = None
+        self.seq = None
+
+    def update(self, payload):
+        '''
+        Parameters
+        ----------
+        payload : dict
+            ``channels-updated`` signal payload.
+
+        Returns
+        -------
+        set
+            Actuated channels.
+        '''
+        if 'actuated' in payload:
+            self.actuated = set(payload['actuated'])
+            self.seq = None
+            return set(self.actuated)
+        state = payload['__channels__']
+        if (self.actuated is not None and self.seq is not None and
+                state['seq'] == self.seq + 1 and 'added' in state):
+            self.actuated = ((self.actuated - set(state['removed'])) |
+                             set(state['added']))
+        else:
+            self.actuated = decode_bitmap(state['bitmap'])
+        self.seq = state['seq']
+        return set(self.actuated)
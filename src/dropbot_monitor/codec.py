@@ -0,0 +1,661 @@
+'''
+Payload codecs for MQTT messages.
+
+Payloads are encoded as JSON (using ``json_tricks``) by default.  Payloads
+encoded using any other codec are prefixed with a header identifying the
+content type, i.e., ``\\x00<content type>\\x00<body>``, so any payload can be
+decoded using :func:`decode` regardless of the codec used to encode it.
+
+Clients list the content types they accept in the ``__accept__`` field of a
+request payload and the bridge replies using the first content type it
+supports (see :func:`negotiate`).
+
+JSON is encoded and decoded by the fastest JSON backend available, i.e.,
+``orjson`` if it is installed, otherwise ``json_tricks`` (see
+:func:`set_json_backend`).  All backends produce (and accept) the
+``json_tricks`` representation of, e.g., NumPy arrays and pandas objects, so
+either end of a connection may use any backend.
+
+Class instances encoded by ``json_tricks`` (i.e., ``__instance_type__``
+objects) are only decoded for registered classes (see
+:func:`register_instance_type`).
+'''
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+from collections import OrderedDict
+import enum
+import importlib
+import math
+import re
+import uuid
+
+from json_tricks.decoders import ClassInstanceHook, TricksPairHook
+from json_tricks.encoders import TricksEncoder
+from json_tricks.nonp import DEFAULT_ENCODERS, DEFAULT_HOOKS
+from logging_helpers import _L
+import json_tricks as jt
+import numpy as np
+import pandas as pd
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+__all__ = ['JsonCodec', 'MsgpackCodec', 'OrjsonBackend', 'TricksJsonBackend',
+           'decode', 'encode', 'get_codec', 'json_dumps', 'json_loads',
+           'negotiate', 'payload_content_type', 'register_codec',
+           'register_instance_type', 'set_json_backend']
+
+HEADER_MARKER = b'\x00'
+
+#: Registered codecs, by content type.
+CODECS = OrderedDict()
+
+#: Available JSON backends, by name, in order of preference.
+JSON_BACKENDS = OrderedDict()
+
+#: Registered instance types, i.e., ``(class or name, decoder)`` by
+#: ``(module name, class name)`` (see :func:`register_instance_type`).
+INSTANCE_TYPES = {}
+# Resolved decoders (or `None` if class could not be imported) of registered
+# instance types, by `(module name, class name)`.
+_instance_decoders = {}
+#: Fully qualified names of classes of DropBot results (e.g., versions in
+#: ``properties``), registered by default.
+DROPBOT_INSTANCE_TYPES = ('semantic_version.base.Version', )
+
+
+def register_instance_type(cls, decoder=None):
+    '''
+    Register class which may be decoded from JSON.
+
+    ``json_tricks`` encodes instances of classes it does not otherwise
+    support as ``{"__instance_type__": [<module>, <class>], "attributes":
+    {...}}`` (or ``"slots"``).  Only instances of registered classes are
+    decoded; any other ``__instance_type__`` object is decoded as a
+    dictionary, i.e., a payload never causes a module to be imported.
+
+    :class:`uuid.UUID` and the classes listed in
+    :data:`DROPBOT_INSTANCE_TYPES` are registered by default; any other
+    class of results exchanged by the bridge and proxies must be registered
+    (in both processes) before instances are decoded.
+
+    Parameters
+    ----------
+    cls : type or str
+        Class, or fully qualified class name (e.g.,
+        ``semantic_version.base.Version``), in which case the module is only
+        imported once an instance is decoded (and only if ``decoder`` is not
+        specified).
+    decoder : function, optional
+        Called as ``decoder(attributes)``, where ``attributes`` maps the name
+        of each encoded attribute (or slot) to its value; returns instance
+        (default: ``cls(**attributes)``).
+    '''
+    if isinstance(cls, type):
+        key = (cls.__module__, cls.__name__)
+    else:
+        key = tuple(cls.rsplit('.', 1))
+    INSTANCE_TYPES[key] = (cls, decoder)
+    _instance_decoders.pop(key, None)
+
+
+def _instance_decoder(key):
+    # Resolve decoder once for each instance type.
+    try:
+        return _instance_decoders[key]
+    except KeyError:
+        pass
+    if key not in INSTANCE_TYPES:
+        # N.B., keys come from payloads, so only registered keys are memoized.
+        return None
+    cls, decoder = INSTANCE_TYPES[key]
+    if decoder is None:
+        try:
+            if not isinstance(cls, type):
+                cls = getattr(importlib.import_module(key[0]), key[1])
+            decoder = (lambda cls: lambda attributes:
+                       cls(**attributes))(cls)
+        except Exception:
+            _L().warning('could not import instance type: `%s.%s`', *key,
+                         exc_info=True)
+    _instance_decoders[key] = decoder
+    return decoder
+
+
+def instance_type_hook(dct):
+    '''
+    ``json_tricks`` hook decoding ``__instance_type__`` objects of registered
+    classes (see :func:`register_instance_type`).
+    '''
+    if not isinstance(dct, dict) or '__instance_type__' not in dct:
+        return dct
+    try:
+        decoder = _instance_decoder(tuple(dct['__instance_type__']))
+    except TypeError:
+        # Not a `[<module>, <class>]` list.
+        decoder = None
+    if decoder is None:
+        _L().debug('instance type not registered: %s',
+                   dct['__instance_type__'])
+        return dct
+    attributes = dict(dct.get('attributes') or {})
+    attributes.update(dct.get('slots') or {})
+    try:
+        return decoder(attributes)
+    except Exception:
+        _L().debug('error decoding instance of %s', dct['__instance_type__'],
+                   exc_info=True)
+        return dct
+
+
+#: ``json_tricks`` decoding hooks, i.e., the default hooks except that class
+#: instances are only decoded for registered classes.
+HOOKS = tuple(instance_type_hook if isinstance(hook, ClassInstanceHook)
+              else hook for hook in DEFAULT_HOOKS)
+
+
+def _encoders(default=None):
+    '''
+    Returns
+    -------
+    tuple
+        Default ``json_tricks`` encoders, followed by an encoder calling
+        ``default`` (if specified) for objects no other encoder supports.
+    '''
+    if default is None:
+        return tuple(DEFAULT_ENCODERS)
+
+    def _default(obj, is_changed=False):
+        return obj if is_changed else default(obj)
+    return tuple(DEFAULT_ENCODERS) + (_default, )
+
+
+class TricksJsonBackend(object):
+    '''
+    Pure-Python JSON backend, using ``json_tricks``.
+    '''
+    name = 'json_tricks'
+
+    def dumps(self, obj, default=None, extra_obj_encoders=tuple()):
+        '''
+        Parameters
+        ----------
+        obj : object
+        default : function, optional
+            Called for objects which cannot otherwise be serialized; should
+            return a serializable object.
+        extra_obj_encoders : list, optional
+            Additional ``json_tricks`` encoders, tried before the default
+            encoders.
+
+        Returns
+        -------
+        bytes
+        '''
+        return jt.dumps(obj, obj_encoders=_encoders(default),
+                        extra_obj_encoders=extra_obj_encoders).encode('utf-8')
+
+    def loads(self, data):
+        '''
+        Parameters
+        ----------
+        data : bytes or str
+
+        Returns
+        -------
+        object
+        '''
+        if isinstance(data, bytes):
+            data = data.decode('utf-8')
+        return jt.loads(data or 'null', obj_pairs_hooks=HOOKS)
+
+
+class OrjsonBackend(object):
+    '''
+    C-accelerated JSON backend, using ``orjson``.
+
+    Objects ``orjson`` does not support natively (e.g., NumPy arrays, pandas
+    objects, date/times and class instances) are encoded by the
+    ``json_tricks`` encoders, i.e., to the same JSON representation as
+    :class:`TricksJsonBackend`.  After decoding, the ``json_tricks`` hooks
+    are applied to each object with a ``json_tricks`` marker key (see
+    :attr:`MARKERS`, e.g., ``__ndarray__`` or ``__instance_type__``).
+
+    Objects ``orjson`` encodes natively, but differently from
+    ``json_tricks`` (i.e., UUIDs and enums), are converted to their
+    ``json_tricks`` representation before encoding, wherever they are nested
+    (e.g., in a dictionary or in the data of a pandas series).
+
+    Anything ``orjson`` rejects (e.g., integers wider than 64 bits, or
+    ``NaN`` literals and comments in JSON) is handled by
+    :class:`TricksJsonBackend`, as are non-finite floats (which ``orjson``
+    would encode as ``null``) and JSON with integer literals which may not
+    fit in 64 bits (which ``orjson`` would decode as floats).
+    '''
+    name = 'orjson'
+
+    #: Objects encoded differently by ``orjson`` and ``json_tricks``.
+    TRICKS_TYPES = (uuid.UUID, enum.Enum)
+    #: Keys marking objects encoded by ``json_tricks``.
+    MARKERS = frozenset(['__bytes_b64__', '__bytes_utf8__', '__complex__',
+                         '__date__', '__datetime__', '__decimal__',
+                         '__enum__', '__fraction__', '__instance_type__',
+                         '__ndarray__', '__pandas_dataframe__',
+                         '__pandas_series__', '__pathlib__', '__set__',
+                         '__slice__', '__time__', '__timedelta__'])
+    # Run of digits which may be an integer wider than 64 bits.
+    cre_wide_int = re.compile(br'\d{20}')
+
+    def __init__(self):
+        self.options = (orjson.OPT_NON_STR_KEYS |
+                        orjson.OPT_PASSTHROUGH_DATACLASS |
+                        orjson.OPT_PASSTHROUGH_DATETIME)
+        self._tricks = TricksJsonBackend()
+        self._encoder = TricksEncoder(obj_encoders=_encoders())
+        self._default = self._wrap(_encoders())
+        # Properties as set by `json_tricks.loads()`.
+        properties = {'preserve_order': True, 'ignore_comments': False,
+                      'decompression': False, 'cls_lookup_map': None,
+                      'allow_duplicates': True}
+        self._hook = TricksPairHook(obj_pairs_hooks=HOOKS,
+                                    properties=properties)
+
+    def dumps(self, obj, default=None, extra_obj_encoders=tuple()):
+        '''
+        See :meth:`TricksJsonBackend.dumps`.
+        '''
+        if default is None and not extra_obj_encoders:
+            default_ = self._default
+        else:
+            default_ = self._wrap(tuple(extra_obj_encoders) +
+                                  _encoders(default))
+        try:
+            return orjson.dumps(self._tricks_form(obj), default=default_,
+                                option=self.options)
+        except (orjson.JSONEncodeError, ValueError):
+            return self._tricks.dumps(obj, default, extra_obj_encoders)
+
+    def _tricks_form(self, obj):
+        '''
+        Returns
+        -------
+        object
+            Object with each UUID and enum (nested in dictionaries, lists and
+            tuples) replaced by its ``json_tricks`` representation (or the
+            object itself, if it contains none).
+
+        Raises
+        ------
+        ValueError
+            If object contains a non-finite float.
+        '''
+        if isinstance(obj, float):
+            if math.isnan(obj) or math.isinf(obj):
+                raise ValueError('Out of range float values are not JSON '
+                                 'compliant')
+            return obj
+        elif isinstance(obj, self.TRICKS_TYPES):
+            return self._tricks_form(self._encoder.default(obj))
+        elif isinstance(obj, dict):
+            items = [(key, self._tricks_form(value))
+                     for key, value in obj.items()]
+            if all(value is obj[key] for key, value in items):
+                return obj
+            return OrderedDict(items)
+        elif isinstance(obj, (list, tuple)):
+            values = [self._tricks_form(value) for value in obj]
+            if all(x is y for x, y in zip(values, obj)):
+                return obj
+            return values
+        return obj
+
+    def _wrap(self, obj_encoders):
+        # `orjson` calls `default` for objects it does not support natively.
+        encoder = TricksEncoder(obj_encoders=obj_encoders)
+
+        def _default(obj):
+            if isinstance(obj, float):
+                # e.g., `numpy.float64`, which `json_tricks` encodes as float.
+                return self._tricks_form(float(obj))
+            elif isinstance(obj, np.ndarray) and obj.dtype.kind in 'biuf':
+                if obj.dtype.kind == 'f' and not np.isfinite(obj).all():
+                    raise ValueError('Out of range float values are not JSON '
+                                     'compliant')
+                # N.B., data of numeric arrays is numbers only.
+                return encoder.default(obj)
+            return self._tricks_form(encoder.default(obj))
+        return _default
+
+    def loads(self, data):
+        '''
+        See :meth:`TricksJsonBackend.loads`.
+        '''
+        if not isinstance(data, bytes):
+            data = data.encode('utf-8')
+        if self.cre_wide_int.search(data):
+            return self._tricks.loads(data)
+        try:
+            obj = orjson.loads(data or b'null')
+        except orjson.JSONDecodeError:
+            return self._tricks.loads(data)
+        if isinstance(obj, (dict, list)):
+            return self._apply_hooks(obj)
+        return obj
+
+    def _apply_hooks(self, obj):
+        # Apply hooks depth-first, as `json_tricks.loads()` does.
+        if isinstance(obj, list):
+            for i, value in enumerate(obj):
+                if isinstance(value, (dict, list)):
+                    obj[i] = self._apply_hooks(value)
+            return obj
+        if '__ndarray__' not in obj or obj.get('dtype') == 'object':
+            # N.B., data of other arrays is numbers only.
+            for key, value in obj.items():
+                if isinstance(value, (dict, list)):
+                    obj[key] = self._apply_hooks(value)
+        if self.MARKERS.isdisjoint(obj):
+            return obj
+        return self._hook(list(obj.items()))
+
+
+def set_json_backend(name=None):
+    '''
+    Select JSON backend of the JSON codec.
+
+    Parameters
+    ----------
+    name : str, optional
+        Name of JSON backend, i.e., ``orjson`` or ``json_tricks`` (default:
+        fastest backend available).
+
+    Raises
+    ------
+    KeyError
+        If backend is not available.
+    '''
+    if name is None:
+        name = next(iter(JSON_BACKENDS))
+    get_codec(JsonCodec.content_type).backend = JSON_BACKENDS[name]
+
+
+class JsonCodec(object):
+    '''
+    JSON codec (default), using the ``json_tricks`` representation of, e.g.,
+    NumPy arrays and pandas objects.
+
+    Parameters
+    ----------
+    backend : str, optional
+        Name of JSON backend (default: fastest backend available).
+    '''
+    content_type = 'json'
+
+    def __init__(self, backend=None):
+        self.backend = JSON_BACKENDS[backend or next(iter(JSON_BACKENDS))]
+
+    def dumps(self, obj, default=None, extra_obj_encoders=tuple()):
+        '''
+        Parameters
+        ----------
+        obj : object
+        default : function, optional
+            Called for objects which cannot otherwise be serialized; should
+            return a serializable object.
+        extra_obj_encoders : list, optional
+            Additional ``json_tricks`` encoders, tried before the default
+            encoders.
+
+        Returns
+        -------
+        bytes
+        '''
+        return self.backend.dumps(obj, default=default,
+                                  extra_obj_encoders=extra_obj_encoders)
+
+    def loads(self, data):
+        return self.backend.loads(data)
+
+
+class MsgpackCodec(object):
+    '''
+    Compact binary codec based on ``msgpack``.
+
+    NumPy arrays with a fixed-size ``dtype`` are carried as raw bytes along
+    with ``dtype`` and ``shape``; integer arrays are carried using the
+    smallest integer type which holds their values (e.g., one byte per
+    element of a channel state array).  pandas ``Series`` and ``DataFrame``
+    objects are carried as their index and column arrays, where a
+    ``RangeIndex`` is carried as ``(start, stop, step)``.  Any other object
+    which is not natively supported by ``msgpack`` is embedded as
+    ``json_tricks`` JSON.
+    '''
+    content_type = 'msgpack'
+
+    EXT_JSON = 1
+    EXT_NDARRAY = 2
+    EXT_SERIES = 3
+    EXT_DATAFRAME = 4
+    EXT_RANGE_INDEX = 5
+
+    def _pack(self, obj, default=None):
+        return msgpack.packb(obj, use_bin_type=True,
+                             default=lambda o: self._encode_ext(o, default))
+
+    def _encode_ext(self, obj, default=None):
+        if isinstance(obj, np.ndarray) and not obj.dtype.hasobject:
+            obj = np.ascontiguousarray(obj)
+            data = [obj.dtype.str, obj.shape]
+            if obj.dtype.kind in 'iu' and obj.size:
+                wire_dtype = np.promote_types(np.min_scalar_type(obj.min()),
+                                              np.min_scalar_type(obj.max()))
+                if wire_dtype.itemsize < obj.dtype.itemsize:
+                    # Carry values using smaller integer type.
+                    data += [obj.astype(wire_dtype).tobytes(),
+                             wire_dtype.str]
+                    return msgpack.ExtType(self.EXT_NDARRAY,
+                                           self._pack(data))
+            data.append(obj.tobytes())
+            return msgpack.ExtType(self.EXT_NDARRAY, self._pack(data))
+        elif isinstance(obj, pd.RangeIndex):
+            data = [obj.start, obj.stop, obj.step, obj.name]
+            return msgpack.ExtType(self.EXT_RANGE_INDEX, self._pack(data))
+        elif isinstance(obj, pd.Index):
+            return self._encode_ext(np.asarray(obj), default)
+        elif isinstance(obj, np.ndarray):
+            return obj.tolist()
+        elif isinstance(obj, np.generic):
+            return obj.item()
+        elif isinstance(obj, pd.Series):
+            data = [obj.name, obj.index, np.asarray(obj)]
+            return msgpack.ExtType(self.EXT_SERIES, self._pack(data, default))
+        elif isinstance(obj, pd.DataFrame):
+            data = [obj.columns.tolist(), obj.index,
+                    [np.asarray(obj[c]) for c in obj.columns]]
+            return msgpack.ExtType(self.EXT_DATAFRAME, self._pack(data,
+                                                                  default))
+        kwargs = {} if default is None else {'default': default}
+        return msgpack.ExtType(self.EXT_JSON,
+                               jt.dumps(obj, **kwargs).encode('utf-8'))
+
+    def _decode_ext(self, code, data):
+        if code == self.EXT_JSON:
+            return json_loads(data)
+        data = self._unpack(data)
+        if code == self.EXT_NDARRAY:
+            dtype, shape, buffer_ = data[:3]
+            if len(data) > 3:
+                # Values carried using smaller integer type.
+                return (np.frombuffer(buffer_, dtype=data[3]).astype(dtype)
+                        .reshape(shape))
+            # Copy, since array would otherwise be read-only.
+            return np.frombuffer(buffer_, dtype=dtype).reshape(shape).copy()
+        elif code == self.EXT_RANGE_INDEX:
+            start, stop, step, name = data
+            return pd.RangeIndex(start, stop, step, name=name)
+        elif code == self.EXT_SERIES:
+            name, index, values = data
+            return pd.Series(values, index=index, name=name)
+        elif code == self.EXT_DATAFRAME:
+            columns, index, values = data
+            return pd.DataFrame(OrderedDict(zip(columns, values)),
+                                index=index, columns=columns)
+        return msgpack.ExtType(code, data)
+
+    def _unpack(self, data):
+        return msgpack.unpackb(data, raw=False, ext_hook=self._decode_ext)
+
+    def dumps(self, obj, default=None):
+        return self._pack(obj, default)
+
+    def loads(self, data):
+        return self._unpack(data)
+
+
+def json_dumps(obj, default=None, extra_obj_encoders=tuple()):
+    '''
+    Encode object as JSON using the selected JSON backend (see
+    :meth:`JsonCodec.dumps`).
+
+    Returns
+    -------
+    bytes
+    '''
+    codec = get_codec(JsonCodec.content_type)
+    return codec.dumps(obj, default=default,
+                       extra_obj_encoders=extra_obj_encoders)
+
+
+def json_loads(data):
+    '''
+    Decode JSON using the selected JSON backend.
+
+    Parameters
+    ----------
+    data : bytes or str
+
+    Returns
+    -------
+    object
+    '''
+    return get_codec(JsonCodec.content_type).loads(data)
+
+
+def register_codec(codec):
+    '''
+    Register codec, making it available to :func:`encode`, :func:`decode`
+    and :func:`negotiate`.
+
+    Parameters
+    ----------
+    codec
+        Object with a ``content_type`` attribute (must not contain a null
+        byte), and ``dumps(obj, default=None)`` and ``loads(data)`` methods.
+    '''
+    CODECS[codec.content_type] = codec
+
+
+def get_codec(content_type):
+    '''
+    Raises
+    ------
+    KeyError
+        If no codec is registered for the content type.
+    '''
+    return CODECS[content_type]
+
+
+def negotiate(accept):
+    '''
+    Parameters
+    ----------
+    accept : list or None
+        Content types accepted by a client, in order of preference.
+
+    Returns
+    -------
+    str
+        First accepted content type with a registered codec (``json`` if
+        none).
+    '''
+    for content_type in accept or []:
+        if content_type in CODECS:
+            return content_type
+    return JsonCodec.content_type
+
+
+def encode(obj, content_type='json', default=None):
+    '''
+    Parameters
+    ----------
+    obj : object
+    content_type : str, optional
+        Content type of registered codec.
+    default : function, optional
+        Called for objects which cannot otherwise be serialized; should
+        return a serializable object.
+
+    Returns
+    -------
+    bytes
+        Payload, with header identifying the content type (except for JSON).
+    '''
+    data = get_codec(content_type).dumps(obj, default=default)
+    if content_type == JsonCodec.content_type:
+        return data
+    return (HEADER_MARKER + content_type.encode('ascii') + HEADER_MARKER +
+            data)
+
+
+def payload_content_type(payload):
+    '''
+    Returns
+    -------
+    str
+        Content type of payload.
+    '''
+    if payload[:1] != HEADER_MARKER:
+        return JsonCodec.content_type
+    return payload[1:payload.index(HEADER_MARKER, 1)].decode('ascii')
+
+
+def decode(payload):
+    '''
+    Decode payload encoded by any registered codec.
+
+    Parameters
+    ----------
+    payload : bytes
+
+    Returns
+    -------
+    object
+    '''
+    if payload[:1] != HEADER_MARKER:
+        return CODECS[JsonCodec.content_type].loads(payload)
+    end = payload.index(HEADER_MARKER, 1)
+    codec = get_codec(payload[1:end].decode('ascii'))
+    return codec.loads(payload[end + 1:])
+
+
+if orjson is not None:
+    JSON_BACKENDS[OrjsonBackend.name] = OrjsonBackend()
+JSON_BACKENDS[TricksJsonBackend.name] = TricksJsonBackend()
+
+register_codec(JsonCodec())
+
+# N.B., `json_tricks` encodes UUIDs as slots (which cannot be set on a UUID).
+register_instance_type(uuid.UUID, lambda attributes:
+                       uuid.UUID(int=attributes['int']))
+for type_name in DROPBOT_INSTANCE_TYPES:
+    register_instance_type(type_name)
+if msgpack is not None:
+    register_codec(MsgpackCodec())
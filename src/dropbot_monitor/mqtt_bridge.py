@@ -1,15 +1,27 @@
 from __future__ import (absolute_import, division, print_function,
                         unicode_literals)
 from builtins import bytes
+from collections import Counter, namedtuple
 import functools as ft
-import re
+import inspect
+import itertools as it
+import numbers
 import threading
 import time
+try:
+    import queue
+except ImportError:
+    import Queue as queue
 
 from asyncio_helpers import cancellable
 from base_node_rpc.async import asyncio
 from dropbot import EVENT_ENABLE, EVENT_CHANNELS_UPDATED, EVENT_SHORTS_DETECTED
 from dropbot_monitor import bind, unbind, wait_for_result, catch_cancel
+from dropbot_monitor.channels import ChannelsEncoder
+from dropbot_monitor.codec import decode, encode, json_dumps, negotiate
+from dropbot_monitor.mqtt_router import TopicRouter
+from dropbot_monitor.mqtt_rpc import (PRIORITIES, error_payload, get_engine,
+                                      is_request_id, result_topic)
 from logging_helpers import _L
 from paho.mqtt.client import Client
 import blinker
@@ -39,7 +51,8 @@ def bytes_to_str_encode(encoding='utf-8'):
     -------
     function
         JSON encoder function, compatible with, e.g.,
-        ``json_tricks.dumps(..., extra_obj_encoders=[])``.
+        ``json_tricks.dumps(..., extra_obj_encoders=[])`` and
+        :func:`dropbot_monitor.codec.json_dumps`.
     '''
     def _wrapped(obj, **kwargs):
         if isinstance(obj, bytes):
@@ -53,8 +66,12 @@ def dump(message, *args, **kwargs):
                                                         kwargs)), end='')
 
 
-def on_connect(client, userdata, flags, rc):
+def on_connect(client, userdata, flags, rc, topics=tuple()):
     '''
+    (Re)subscribe to the request topics of the connected device (if any), and
+    to the result topics of requests sent by the bridge (see
+    :meth:`dropbot_monitor.mqtt_rpc.RpcEngine.resubscribe`).
+
     Parameters
     ==========
     client : paho.mqtt.client.Client
@@ -65,20 +82,706 @@ def on_connect(client, userdata, flags, rc):
         Response flags sent by the broker
     rc : int
         The connection result
+    topics : list, optional
+        Topics to subscribe to (see :func:`request_topics`).
     '''
-    client.subscribe('/#', qos=1)
+    if topics:
+        client.subscribe([(topic, 1) for topic in topics])
+    get_engine(client).resubscribe()
+
 
+def dumps_(obj, accept=None):
+    '''
+    Parameters
+    ----------
+    obj : object
+    accept : list, optional
+        Content types accepted by client, in order of preference, i.e., the
+        ``__accept__`` field of the request payload (default: JSON).
 
-dumps_ = ft.partial(jt.dumps, extra_obj_encoders=(bytes_to_str_encode(), ))
+    Returns
+    -------
+    bytes
+        Payload encoded using the first accepted content type supported.
+    '''
+    content_type = negotiate(accept)
+    if content_type == 'json':
+        return json_dumps(obj, extra_obj_encoders=(bytes_to_str_encode(), ))
+    return encode(obj, content_type)
 
 
-cre_topic = re.compile(r'^/(?P<device_name>[^/]+)/(?P<uuid>[^/]+)/'
-                       r'(?P<type>signal|property|call|result)/'
-                       r'(?P<name>[^/]+)$')
+#: Request types executed by the bridge.
+REQUEST_TYPES = ('call', 'priority-call', 'property', 'batch')
 
 
-def on_message(device_name, client, userdata, message, proxy=None):
+def request_topics(prefix):
     '''
+    Parameters
+    ----------
+    prefix : str
+        Device topic prefix, e.g., ``/dropbot/<uuid>``.
+
+    Returns
+    -------
+    list
+        Topics the bridge subscribes to for a device, i.e., requests (see
+        :data:`REQUEST_TYPES`) and signals sent to the device.
+    '''
+    return ['%s/%s/+' % (prefix, type_)
+            for type_ in REQUEST_TYPES + ('send-signal', )]
+
+
+#: Request type by topic filter, i.e., ``/<device_name>/<uuid>/<type>/<name>``.
+request_router = TopicRouter()
+for type_ in REQUEST_TYPES:
+    request_router.add('/+/+/%s/+' % type_, type_)
+del type_
+
+
+#: Device properties which do not change while connected, answered from
+#: memory by the bridge (see :meth:`DeviceWorker.fill_cache`).
+CACHED_PROPERTIES = ('hardware_version', 'number_of_channels', 'port',
+                     'properties', 'uuid')
+
+
+class Method(namedtuple('Method', 'name function signature')):
+    '''
+    Dispatch table entry of a method, i.e., ``function`` is the bound method
+    (wrapped by any hooks) and ``signature`` is an :class:`inspect.Signature`
+    (or, on Python 2, an :func:`inspect.getargspec` argument specification).
+    '''
+    pass
+
+
+def get_signature(function):
+    '''
+    Returns
+    -------
+    inspect.Signature or inspect.ArgSpec
+        Signature of function, or ``None`` if not available.
+    '''
+    try:
+        if hasattr(inspect, 'signature'):
+            return inspect.signature(function)
+        return inspect.getargspec(function)
+    except (TypeError, ValueError):
+        return None
+
+
+class DispatchTable(object):
+    '''
+    Methods and properties of a device proxy exposed through MQTT.
+
+    The table is built once per device connection, so each request is
+    dispatched with a single dictionary lookup instead of a dynamic attribute
+    lookup on the proxy.  As with :func:`mqtt_proxy.proxy_type`, all public
+    (i.e., not ``_``-prefixed) attributes of the proxy class are exposed; in
+    addition, public data attributes of the proxy instance are exposed as
+    read-only properties, unless listed in ``settable``.  Requests for any
+    other name are rejected without accessing the proxy.
+
+    Hooks may be added per method, e.g., to time calls (see :func:`timed`) or
+    to cache results (see :func:`memoized`).
+
+    Parameters
+    ----------
+    proxy
+        Object exposed through MQTT, e.g., ``dropbot.SerialProxy``.
+    settable : list, optional
+        Names of data attributes of the proxy instance which may be set.
+    '''
+    def __init__(self, proxy, settable=tuple()):
+        self.proxy = proxy
+        #: Methods, by name.
+        self.methods = {}
+        #: Properties, by name; ``True`` if property may be set.
+        self.properties = {}
+        cls = type(proxy)
+        for name in dir(cls):
+            if name.startswith('_'):
+                continue
+            attr = getattr(cls, name)
+            if isinstance(attr, property):
+                self.properties[name] = attr.fset is not None
+            elif inspect.isfunction(attr) or inspect.ismethod(attr):
+                function = getattr(proxy, name)
+                self.methods[name] = Method(name, function,
+                                            get_signature(function))
+            else:
+                self.properties[name] = False
+        for name in getattr(proxy, '__dict__', {}):
+            if not name.startswith('_'):
+                self.properties[name] = name in settable
+
+    def add_hook(self, name, hook):
+        '''
+        Wrap method with hook.
+
+        Parameters
+        ----------
+        name : str
+            Name of method.
+        hook : function
+            Called as ``hook(name, function)``; returns function to call in
+            place of ``function``.
+        '''
+        method = self.methods[name]
+        self.methods[name] = method._replace(function=hook(name,
+                                                           method.function))
+
+    def execute(self, verb, name, args=tuple(), kwargs=None):
+        '''
+        Execute a single ``call`` or ``property`` request.
+
+        Parameters
+        ----------
+        verb : str
+            Either ``call`` or ``property``.
+        name : str
+            Name of method or property.
+        args : tuple, optional
+            Method arguments, or (for ``property``) a single value to set.
+        kwargs : dict, optional
+            Method keyword arguments.
+
+        Returns
+        -------
+        object
+            Result of method call or property value (``None`` when setting a
+            property).
+
+        Raises
+        ------
+        AttributeError
+            If name is not a method (or property) of the proxy, or if the
+            property may not be set.
+        '''
+        if verb == 'call':
+            method = self.methods.get(name)
+            if method is None:
+                raise AttributeError('No method `%s`' % name)
+            return method.function(*args, **(kwargs or {}))
+        elif verb == 'property':
+            settable = self.properties.get(name)
+            if settable is None:
+                raise AttributeError('No property `%s`' % name)
+            elif not args:
+                return getattr(self.proxy, name)
+            elif not settable:
+                raise AttributeError('Property `%s` may not be set' % name)
+            setattr(self.proxy, name, args[0])
+        else:
+            raise ValueError('Unsupported request type: `%s`' % verb)
+
+
+def timed(timings):
+    '''
+    Returns
+    -------
+    function
+        Dispatch table hook recording the duration (in seconds) of each call
+        to ``timings[<method name>]`` (e.g., a ``defaultdict(list)``).
+    '''
+    def hook(name, function):
+        @ft.wraps(function)
+        def _timed(*args, **kwargs):
+            start = time.time()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                timings[name].append(time.time() - start)
+        return _timed
+    return hook
+
+
+def memoized(name, function):
+    '''
+    Dispatch table hook caching the result of a method per arguments, e.g.,
+    for methods which only read static device information.
+
+    Arguments must be hashable (e.g., JSON scalars).
+    '''
+    results = {}
+
+    @ft.wraps(function)
+    def _memoized(*args, **kwargs):
+        key = (args, tuple(sorted(kwargs.items())))
+        if key not in results:
+            results[key] = function(*args, **kwargs)
+        return results[key]
+    return _memoized
+
+
+def expired(deadline):
+    '''
+    Parameters
+    ----------
+    deadline : float or None
+        Request deadline (seconds since the epoch, according to the clock of
+        the bridge), i.e., the time the request was received plus the
+        ``__timeout__`` field of the request payload.
+
+    Returns
+    -------
+    bool
+        ``True`` if the caller has already given up waiting for a reply.
+    '''
+    return deadline is not None and time.time() > deadline
+
+
+class Request(namedtuple('Request', 'type name payload topic request_id '
+                                     'deadline accept priority received')):
+    '''
+    Decoded request, i.e., ``type`` is one of ``call``, ``property``, or
+    ``batch``; ``topic`` is the topic to publish the reply to; ``priority`` is
+    one of :data:`dropbot_monitor.mqtt_rpc.PRIORITIES`; and ``received`` is
+    the time (seconds since the epoch) the request was received.
+    '''
+    pass
+
+
+def is_read(request):
+    '''
+    Returns
+    -------
+    bool
+        ``True`` if request reads a property value (i.e., ``property``
+        request without arguments).
+    '''
+    return (request.type == 'property' and isinstance(request.payload, dict)
+            and not request.payload.get('args', tuple(request.payload)))
+
+
+def written(request):
+    '''
+    Returns
+    -------
+    set
+        Names of properties which may be set by request, i.e., property
+        writes and calls to ``set_<name>`` methods (including within a
+        batch).
+    '''
+    if request.type == 'batch':
+        requests = (request.payload.get('args', tuple())
+                    if isinstance(request.payload, dict) else tuple())
+        requests = [(r.get('verb'), r.get('name')) for r in requests
+                    if isinstance(r, dict)]
+    else:
+        requests = [(request.type, request.name)]
+    names = set()
+    for verb, name in requests:
+        if verb == 'property':
+            names.add(name)
+        elif verb == 'call' and name and name.startswith('set_'):
+            names.add(name[len('set_'):])
+    return names
+
+
+class DeviceWorker(object):
+    '''
+    Execute requests for a device in a dedicated thread, in the order they
+    were submitted, and publish the results.
+
+    Requests published to ``/<device_name>/<uuid>/batch/<name>`` contain a
+    list of ``{"verb": ..., "name": ..., "args": ..., "kwargs": ...}``
+    requests, which are executed in order.  A single list of results is
+    published in reply, where the result of each failed request is replaced
+    by an error reply payload.
+
+    Requests are skipped once their timeout (i.e., the ``__timeout__`` field
+    of the request payload, in seconds since the request was received) has
+    passed, since the caller has already given up waiting for the reply.
+
+    Replies are encoded using the first content type listed in the
+    ``__accept__`` field of the request payload which has a registered codec
+    (JSON by default; see :mod:`dropbot_monitor.codec`).
+
+    Queued requests with a higher priority (e.g., ``high`` for safety-critical
+    commands such as disabling the high voltage output) are executed ahead of
+    queued requests with a lower priority.  Requests with the same priority
+    are executed in the order submitted.  The time each request spends in the
+    queue is recorded per priority class (see :meth:`queue_wait`).
+
+    Concurrent reads of the same property (with the same priority) are
+    collapsed into a single device access: a read submitted while an
+    identical read is queued or executing is not queued; instead, the result
+    of the pending read is published to both requesters.  Any other request
+    (e.g., a property write) ends collapsing of reads submitted before it, so
+    reads observe the effects of requests with the *same priority* submitted
+    before them.  Note that a read with a higher priority may be executed
+    ahead of (i.e., not observe the effects of) a queued request with a lower
+    priority, e.g., a ``high`` priority read submitted after a queued
+    ``normal`` priority write may return the value before the write.
+
+    Once :meth:`fill_cache` has been called, reads of properties which do not
+    change while connected (e.g., ``number_of_channels``) are answered from
+    memory as soon as they are submitted, without queuing and without
+    accessing the device.  A cached entry is dropped as soon as a request
+    which may set the property (i.e., a property write or a call to the
+    corresponding ``set_<name>`` method) is submitted.  Since a worker is
+    created for each device connection, the cache is refilled on reconnect.
+
+    Parameters
+    ----------
+    client : paho.mqtt.client.Client
+    proxy : dropbot.SerialProxy
+        Object exposed through MQTT.
+    stats : collections.Counter, optional
+        Request counters, e.g., ``expired``, ``deduplicated``,
+        ``cache_hits``, ``rejected``.
+    table : DispatchTable, optional
+        Methods and properties exposed (default: all methods and properties
+        of ``proxy``).
+    '''
+    def __init__(self, client, proxy, stats=None, table=None):
+        self.client = client
+        self.proxy = proxy
+        self.table = DispatchTable(proxy) if table is None else table
+        self.stats = Counter() if stats is None else stats
+        self.queue = queue.PriorityQueue()
+        # Sequence number, to execute requests with the same priority in the
+        # order submitted.
+        self._sequence = it.count()
+        # Queue wait time statistics per priority class.
+        self._wait = {priority: {'count': 0, 'total_s': 0., 'max_s': 0.}
+                      for priority in PRIORITIES}
+        # Pending property reads, by `(name, priority)`; each entry is the
+        # list of requests sharing a single device access.
+        self._reads = {}
+        # Cached property values, and encoded payloads by
+        # `(name, content type)`.
+        self._cache = {}
+        self._encoded = {}
+        self._lock = threading.Lock()
+        self._stopped = False
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        '''
+        Stop worker thread once the request being executed (if any) completes.
+
+        Requests still queued, or submitted after the worker is stopped, are
+        not executed; an error reply is published for each such request
+        with a correlation ID, so callers do not wait for a reply that never
+        comes.
+        '''
+        with self._lock:
+            self._stopped = True
+            self._reads.clear()
+        self.queue.put((-1, next(self._sequence), None))
+        if not self.thread.is_alive():
+            self._reject_queued()
+
+    def _reject(self, requests):
+        '''
+        Publish error reply to each request (with a correlation ID) which is
+        not executed since worker is stopped.
+        '''
+        for request in requests:
+            self.stats['rejected'] += 1
+            if request.request_id is not None:
+                exception = RuntimeError('Device worker stopped (e.g., device '
+                                         'disconnected); request `%s` not '
+                                         'executed.' % request.name)
+                self.client.publish(request.topic,
+                                    payload=dumps_(error_payload(exception)))
+
+    def _reject_queued(self):
+        while True:
+            try:
+                requests = self.queue.get_nowait()[-1]
+            except queue.Empty:
+                break
+            if requests is not None:
+                self._reject(requests)
+
+    def fill_cache(self, names=CACHED_PROPERTIES):
+        '''
+        Read properties which do not change while connected, to answer
+        subsequent reads from memory.
+
+        Fields of the ``properties`` snapshot which are also properties of the
+        proxy (e.g., ``uuid``) are cached from the snapshot.
+
+        Should be called before the worker is started, since the device is
+        accessed from the calling thread.
+
+        Parameters
+        ----------
+        names : list, optional
+            Names of properties to cache (default: :data:`CACHED_PROPERTIES`).
+        '''
+        cache = {}
+        for name in names:
+            try:
+                cache[name] = self.table.execute('property', name)
+            except Exception:
+                _L().debug('could not cache property `%s`', name,
+                           exc_info=True)
+        properties = cache.get('properties')
+        if isinstance(properties, pd.Series):
+            for name, value in properties.items():
+                if name not in cache and name in self.table.properties:
+                    cache[name] = value
+        with self._lock:
+            self._cache = cache
+            self._encoded.clear()
+        _L().debug('cached properties: %s', ', '.join(sorted(cache)))
+
+    def cached(self, name):
+        '''
+        Parameters
+        ----------
+        name : str
+            Name of property.
+
+        Returns
+        -------
+        object
+            Cached value of property (see :meth:`fill_cache`).
+
+        Raises
+        ------
+        KeyError
+            If property is not cached.
+        '''
+        with self._lock:
+            return self._cache[name]
+
+    def _invalidate(self, names):
+        '''
+        Drop cached properties.
+
+        Must be called with ``_lock`` held.
+        '''
+        properties = self._cache.get('properties')
+        for name in names:
+            if name in self._cache:
+                del self._cache[name]
+                if isinstance(properties, pd.Series) and name in properties:
+                    # Snapshot is stale as well.
+                    self._cache.pop('properties', None)
+                self._encoded = {key: payload
+                                 for key, payload in self._encoded.items()
+                                 if key[0] in self._cache}
+                _L().debug('invalidated cached property `%s`', name)
+
+    def submit(self, request):
+        '''
+        Parameters
+        ----------
+        request : Request
+        '''
+        with self._lock:
+            if self._stopped:
+                requests = None
+            elif is_read(request) and request.name in self._cache:
+                # Answer from memory.
+                content_type = negotiate(request.accept)
+                key = (request.name, content_type)
+                payload = self._encoded.get(key)
+                if payload is None:
+                    payload = dumps_(self._cache[request.name],
+                                     [content_type])
+                    self._encoded[key] = payload
+                self.stats['cache_hits'] += 1
+                requests = None
+            elif is_read(request):
+                key = (request.name, request.priority)
+                requests = self._reads.get(key)
+                if requests is not None:
+                    # Identical read already pending; share its result.
+                    requests.append(request)
+                    self.stats['deduplicated'] += 1
+                    return
+                requests = self._reads[key] = [request]
+            else:
+                # Reads submitted after this request must observe its
+                # effects, so they must not join reads submitted before it.
+                self._reads.clear()
+                self._invalidate(written(request))
+                requests = [request]
+            if requests is not None:
+                # Queue while holding lock, so `stop()` rejects any request
+                # submitted before it.
+                self.queue.put((PRIORITIES.index(request.priority),
+                                next(self._sequence), requests))
+                return
+            stopped = self._stopped
+        if stopped:
+            self._reject([request])
+        else:
+            self.client.publish(request.topic, payload=payload)
+
+    def queue_wait(self):
+        '''
+        Returns
+        -------
+        dict
+            Number of requests executed, and mean and maximum time (in
+            seconds) requests spent in the queue, per priority class.
+        '''
+        return {priority: {'count': wait['count'],
+                           'mean_s': (wait['total_s'] / wait['count']
+                                      if wait['count'] else 0.),
+                           'max_s': wait['max_s']}
+                for priority, wait in self._wait.items()}
+
+    def _run(self):
+        while True:
+            requests = self.queue.get()[-1]
+            if requests is None:
+                self._reject_queued()
+                break
+            request = requests[0]
+            wait_s = time.time() - request.received
+            wait = self._wait[request.priority]
+            wait['count'] += 1
+            wait['total_s'] += wait_s
+            wait['max_s'] = max(wait['max_s'], wait_s)
+            _L().debug('%s priority request waited %.3f s', request.priority,
+                       wait_s)
+            try:
+                if is_read(request):
+                    self.handle_reads(requests)
+                else:
+                    self.handle(request)
+            except Exception:
+                _L().error('error handling request: `%s`', request,
+                           exc_info=True)
+        _L().debug('stopped device worker')
+
+    def handle_reads(self, requests):
+        '''
+        Read property once and publish value to each requester.
+
+        Parameters
+        ----------
+        requests : list
+            Reads of the same property, i.e., :class:`Request` instances.
+        '''
+        name = requests[0].name
+        if all(expired(request.deadline) for request in requests):
+            result = None
+        else:
+            try:
+                result = self.table.execute('property', name)
+            except Exception as exception:
+                _L().error('property error: name=`%s`', name, exc_info=True)
+                result = exception
+            else:
+                _L().debug('property: name=`%s`', name)
+
+        with self._lock:
+            key = (name, requests[0].priority)
+            if self._reads.get(key) is requests:
+                del self._reads[key]
+            # Reads submitted from now on are queued separately.
+            requests = list(requests)
+
+        payloads = {}
+        for request in requests:
+            if expired(request.deadline):
+                self.stats['expired'] += 1
+                _L().debug('skip expired request: property(%s)', name)
+            elif isinstance(result, Exception):
+                if request.request_id is not None:
+                    self.client.publish(request.topic, payload=dumps_(
+                        error_payload(result)))
+            else:
+                # Encode value once per content type.
+                content_type = negotiate(request.accept)
+                if content_type not in payloads:
+                    payloads[content_type] = dumps_(result, [content_type])
+                self.client.publish(request.topic,
+                                    payload=payloads[content_type])
+
+    def handle(self, request):
+        '''
+        Execute request and publish result.
+
+        Parameters
+        ----------
+        request : Request
+        '''
+        client = self.client
+        table = self.table
+        type_, name, payload, topic, request_id, deadline, accept = \
+            request[:7]
+        if expired(deadline):
+            self.stats['expired'] += 1
+            _L().debug('skip expired request: %s(%s)', type_, name)
+        elif type_ == 'call':
+            try:
+                result = table.execute(type_, name,
+                                       payload.get('args', tuple()),
+                                       payload.get('kwargs', {}))
+            except Exception as exception:
+                _L().error('call error: name=`%s`, payload=`%s`', name,
+                           payload, exc_info=True)
+                if request_id is not None:
+                    client.publish(topic, payload=dumps_(error_payload(
+                        exception)))
+            else:
+                _L().debug('call: name=`%s`, payload=`%s`', name, payload)
+                client.publish(topic, payload=dumps_(result, accept))
+        elif type_ == 'property':
+            try:
+                args = payload.get('args', tuple(payload))
+                value = table.execute(type_, name, args)
+                payload = dumps_(value, accept) if not args else None
+            except Exception as exception:
+                _L().error('property error: name=`%s`', name, exc_info=True)
+                if request_id is not None:
+                    client.publish(topic, payload=dumps_(error_payload(
+                        exception)))
+            else:
+                _L().debug('property: name=`%s`', name)
+                client.publish(topic, payload=payload)
+        elif type_ == 'batch':
+            results = []
+            for batch_request in payload.get('args', tuple()):
+                if expired(deadline):
+                    self.stats['expired'] += 1
+                    _L().debug('skip expired batch: %s', name)
+                    break
+                try:
+                    results.append(table.execute(batch_request['verb'],
+                                                 batch_request['name'],
+                                                 batch_request.get('args',
+                                                                   tuple()),
+                                                 batch_request.get('kwargs',
+                                                                   {})))
+                except Exception as exception:
+                    _L().error('batch error: request=`%s`', batch_request,
+                               exc_info=True)
+                    results.append(error_payload(exception))
+            else:
+                _L().debug('batch: %d requests', len(results))
+                client.publish(topic, payload=dumps_(results, accept))
+
+
+def on_message(device_name, client, userdata, message, worker=None,
+               device_id=None):
+    '''
+    Decode request and submit it to the device worker.
+
+    The topic is matched before the payload is decoded, so messages which are
+    not requests to the device (if ``device_id`` is specified) are skipped
+    without being parsed.
+
+    Requests are executed by the worker thread so slow device operations do
+    not block the MQTT network loop (see :class:`DeviceWorker`).
+
+    The priority of a request is set by the ``__priority__`` field of the
+    request payload (``normal`` by default).  Calls published to
+    ``/<device_name>/<uuid>/priority-call/<name>`` have ``high`` priority.
+
     Parameters
     ----------
     client : paho.mqtt.client.Client
@@ -87,63 +790,85 @@ def on_message(device_name, client, userdata, message, proxy=None):
         The private user data as set in Client() or userdata_set()
     message : paho.mqtt.client.MQTTMessage
         This is a class with members topic, payload, qos, retain.
+    worker : DeviceWorker, optional
+        Worker executing requests for the connected device.
+    device_id : str, optional
+        UUID of the connected device.
     '''
     logger = _L()
+    type_, levels = request_router.route(message.topic)
+    if (worker is None or type_ is None or levels[0] != device_name or
+            (device_id is not None and levels[1] != device_id)):
+        logger.debug('skip message(%s)@%s', message.topic, message.qos)
+        return
+
     try:
         if not message.payload:
             payload = {}
         else:
-            payload = jt.loads(message.payload.decode('utf-8'))
+            payload = decode(message.payload)
     except Exception:
         logger.debug('could not decode JSON message=`%s`', message.payload,
                      exc_info=True)
         payload = message.payload.decode('utf-8')
 
-    match = cre_topic.match(message.topic)
-    if match and match.group('device_name') == device_name:
-        device_name, uuid_, type_, name = match.groups()
-        logger.debug('%s(%s::%s)@%s: `%s`', type_, uuid_, name, message.qos,
-                     payload)
-        if proxy is not None:
-            if type_ == 'call':
-                f = getattr(proxy, name)
-                try:
-                    result = f(*payload.get('args', tuple()),
-                               **payload.get('kwargs', {}))
-                except Exception:
-                    _L().error('call error: name=`%s`, payload=`%s`', name,
-                               payload, exc_info=True)
-                else:
-                    _L().debug('call: name=`%s`, payload=`%s`', name, payload)
-                    client.publish('/%s/%s/result/%s' % (device_name, uuid_,
-                                                         name),
-                                   payload=dumps_(result))
-            elif type_ == 'property':
-                try:
-                    args = payload.get('args', tuple(payload))
-                    if not args:
-                        value = getattr(proxy, name)
-                        payload = dumps_(value)
-                    else:
-                        setattr(proxy, name, args[0])
-                        payload = None
-                except Exception:
-                    _L().error('property error: name=`%s`', name,
-                               exc_info=True)
-                else:
-                    _L().debug('property: name=`%s`', name)
-                    client.publish('/%s/%s/result/%s' % (device_name, uuid_,
-                                                         name),
-                                   payload=payload)
-    else:
-        logger.debug('message(%s)@%s: `%s`', message.topic, message.qos,
-                     payload)
-
+    device_name, uuid_, name = levels
+    logger.debug('%s(%s::%s)@%s: `%s`', type_, uuid_, name, message.qos,
+                 payload)
+    # Reply to correlation ID topic if specified in request.
+    # Requests are executed in the order received, so replies are published
+    # in order.
+    request_id = (payload.pop('__id__', None)
+                  if isinstance(payload, dict) else None)
+    if request_id is not None and not is_request_id(request_id):
+        logger.debug('ignore invalid correlation ID: `%s`', request_id)
+        request_id = None
+    timeout = (payload.pop('__timeout__', None)
+               if isinstance(payload, dict) else None)
+    if timeout is not None and (isinstance(timeout, bool) or
+                                not isinstance(timeout, numbers.Real) or
+                                not timeout >= 0):
+        logger.debug('ignore invalid timeout: `%s`', timeout)
+        timeout = None
+    accept = (payload.pop('__accept__', None)
+              if isinstance(payload, dict) else None)
+    priority = (payload.pop('__priority__', None)
+                if isinstance(payload, dict) else None)
+    if type_ == 'priority-call':
+        type_, priority = 'call', 'high'
+    elif priority not in PRIORITIES:
+        priority = 'normal'
+    topic = result_topic('/%s/%s' % (device_name, uuid_), name, request_id)
+    received = time.time()
+    deadline = None if timeout is None else received + timeout
+    worker.submit(Request(type_, name, payload, topic, request_id, deadline,
+                          accept, priority, received))
+
+
+def monitor(client=None, codec='json', compact_channels=False, **kwargs):
+    '''
+    Parameters
+    ----------
+    client : paho.mqtt.client.Client, optional
+        MQTT client (default: connect new client to ``localhost``).
+    codec : str, optional
+        Content type used to encode signals forwarded to MQTT (see
+        :mod:`dropbot_monitor.codec`).
+    compact_channels : bool, optional
+        If ``True``, publish ``channels-updated`` payloads with a bitmap of
+        channel states and differences instead of the full list of actuated
+        channels (see :mod:`dropbot_monitor.channels`).
+    **kwargs
+        Additional keyword arguments passed to
+        :func:`dropbot_monitor.blinker_mqtt.bind`, e.g., ``batch``,
+        ``policies``, or ``queue_size``.
+    '''
+    # Topics subscribed to for the connected device (if any).
+    topics = []
 
-def monitor(client=None):
     if client is None:
         client = Client()
-        client.on_connect = on_connect
+        client.on_connect = ft.partial(on_connect, topics=topics)
         client.connect_async('localhost')
         client.loop_start()
         client_created = True
@@ -157,35 +882,63 @@ def monitor(client=None):
         monitor_task.connected.clear()
         dropbot_ = message['dropbot']
         monitor_task.dropbot = dropbot_
-        client.on_message = ft.partial(on_message, 'dropbot', proxy=dropbot_)
+        monitor_task.worker = DeviceWorker(client, dropbot_,
+                                           stats=monitor_task.stats)
+        monitor_task.worker.fill_cache()
+        monitor_task.worker.start()
 
         device_id = str(dropbot_.uuid)
+        client.on_message = ft.partial(on_message, 'dropbot',
+                                       worker=monitor_task.worker,
+                                       device_id=device_id)
         connect_topic = '/dropbot/%(uuid)s/signal' % {'uuid': device_id}
         send_topic = '/dropbot/%(uuid)s/send-signal' % {'uuid': device_id}
 
+        bind_kwargs = kwargs.copy()
+        if compact_channels:
+            bind_kwargs['transforms'] = dict(kwargs.get('transforms') or {})
+            bind_kwargs['transforms']['channels-updated'] = \
+                ChannelsEncoder(dropbot_.number_of_channels)
+
         # Bind blinker signals namespace to corresponding MQTT topics.
         bind(signals=signals, paho_client=client,
-             connect_topic=connect_topic, send_topic=send_topic)
+             connect_topic=connect_topic, send_topic=send_topic, codec=codec,
+             **bind_kwargs)
+        # Subscribe only to requests and signals sent to this device.
+        topics[:] = request_topics('/dropbot/' + device_id)
+        client.subscribe([(topic, 1) for topic in topics])
 
         dropbot_.update_state(event_mask=EVENT_CHANNELS_UPDATED |
                               EVENT_SHORTS_DETECTED | EVENT_ENABLE)
 
+        try:
+            # Read by `fill_cache()` above; avoid another device access.
+            properties = monitor_task.worker.cached('properties')
+        except KeyError:
+            properties = dropbot_.properties
         client.publish('/dropbot/%(uuid)s/properties' % {'uuid': device_id},
-                       payload=dropbot_.properties.to_json(), qos=1,
-                       retain=True)
+                       payload=properties.to_json(), qos=1, retain=True)
 
         prefix = '/dropbot/' + device_id
         monitor_task.device_id = device_id
         monitor_task.property = ft.partial(wait_for_result, client, 'property',
                                            prefix)
         monitor_task.call = ft.partial(wait_for_result, client, 'call', prefix)
+        monitor_task.batch = ft.partial(wait_for_result, client, 'batch',
+                                        prefix, 'batch')
         monitor_task.connected.set()
 
     @asyncio.coroutine
     def _on_dropbot_disconnected(sender, **message):
         monitor_task.connected.clear()
         monitor_task.dropbot = None
+        client.on_message = ft.partial(on_message, 'dropbot')
+        monitor_task.worker.stop()
+        monitor_task.worker = None
         unbind(signals)
+        if topics:
+            client.unsubscribe(list(topics))
+            del topics[:]
         client.publish('/dropbot/%(uuid)s/properties' %
                        {'uuid': monitor_task.device_id}, payload=None, qos=1,
                        retain=True)
@@ -195,6 +948,8 @@ def monitor(client=None):
                                            weak=False)
 
     def stop():
+        if getattr(monitor_task, 'worker', None) is not None:
+            monitor_task.worker.stop()
         if getattr(monitor_task, 'dropbot', None) is not None:
             monitor_task.dropbot.set_state_of_channels(pd.Series(),
                                                        append=False)
@@ -211,6 +966,8 @@ def monitor(client=None):
 
     monitor_task = cancellable(catch_cancel(db.monitor.monitor))
     monitor_task.connected = threading.Event()
+    # Request counters, e.g., number of expired requests skipped.
+    monitor_task.stats = Counter()
     thread = threading.Thread(target=monitor_task, args=(signals, ))
     thread.daemon = True
     thread.start()
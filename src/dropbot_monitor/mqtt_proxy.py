@@ -3,10 +3,17 @@ from __future__ import (absolute_import, division, print_function,
 import functools as ft
 import inspect
 import logging
-import re
 import threading
-
-from dropbot_monitor import wait_for_result, asyncio
+import time
+import uuid
+
+from dropbot_monitor import (SNAPSHOT, add_local_receiver, asyncio,
+                             remove_local_receiver, unpack_samples,
+                             wait_for_result)
+from dropbot_monitor.codec import decode, encode
+from dropbot_monitor.mqtt_router import TopicRouter
+from dropbot_monitor.mqtt_rpc import (RemoteAttributeError, get_engine,
+                                      send_request)
 from logging_helpers import _L
 from paho.mqtt.client import Client
 import blinker
@@ -16,14 +23,32 @@ import json_tricks as jt
 jt.encoders.pandas_encode._warned = True
 jt.decoders.pandas_hook._warned = True
 
-__all__ = ['MqttProxy']
+__all__ = ['Batch', 'IMMUTABLE', 'LoopThread', 'MqttProxy', 'PropertyCache',
+           'RemoteProperty', 'get_loop_thread', 'proxy_type',
+           'request_snapshot']
+
+#: Message type by topic filter.
+router = TopicRouter()
+router.add('/+/+/properties', 'properties')
+router.add('/+/+/signal/+', 'signal')
+router.add('/+/+/signal/%s/+' % SNAPSHOT, 'snapshot')
+
+#: Cache policy for properties which do not change while connected to a device.
+IMMUTABLE = 'immutable'
 
-cre_topic = re.compile(r'^/[^/]+/(?P<uuid>[^/]+)/signal/'
-                       r'(?P<signalname>[^/]+)$')
-cre_properties = re.compile(r'^/[^/]+/(?P<uuid>[^/]+)/properties')
+#: Default cache policies, i.e., ``MqttProxy(..., cache=True)``.
+DEFAULT_CACHE_POLICIES = {'hardware_version': IMMUTABLE,
+                          'number_of_channels': IMMUTABLE,
+                          'port': IMMUTABLE,
+                          'properties': IMMUTABLE,
+                          'uuid': IMMUTABLE}
 
+#: Cached properties invalidated by each device signal.
+INVALIDATED_BY = {'channels-updated': ('state_of_channels', ),
+                  'shorts-detected': ('state_of_channels', )}
 
-def on_message(name, signals, client, userdata, message):
+
+def on_message(name, signals, client, userdata, message, local=True):
     '''MQTT client message callback.
 
     Once a DropBot has published available properties, bind the ``call`` and
@@ -33,6 +58,16 @@ def on_message(name, signals, client, userdata, message):
     Forward any message published to a ``signal`` topic to a corresponding
     signal in the ``signals`` blinker namespace.
 
+    If the signals of the DropBot are bound in this process (e.g., the
+    bridge runs in the same process), signals are received directly from the
+    bridge namespace instead (see
+    :func:`dropbot_monitor.blinker_mqtt.add_local_receiver`), i.e., without
+    decoding, and MQTT signal messages for the DropBot are ignored.
+
+    The payloads of a snapshot (see :func:`request_snapshot`) are forwarded
+    to the corresponding signals only if the snapshot was requested by this
+    client.
+
     Parameters
     ----------
     name : str
@@ -43,37 +78,117 @@ def on_message(name, signals, client, userdata, message):
         The private user data as set in Client() or userdata_set()
     message : paho.mqtt.client.MQTTMessage
         This is a class with members topic, payload, qos, retain.
+    local : bool, optional
+        If ``False``, always receive signals through MQTT.
     '''
-    if not message.topic.startswith('/' + name):
+    type_, levels = router.route(message.topic)
+    if type_ is None or levels[0] != name:
         return
 
-    match = cre_properties.match(message.topic)
-    if match:
-        uuid_ = match.group('uuid')
+    if type_ == 'properties':
+        uuid_ = levels[1]
         prefix = '/%s/%s' % (name, uuid_)
+        local_receiver = getattr(client, 'local_receiver', None)
+        if local_receiver is not None:
+            remove_local_receiver(*local_receiver)
+            client.local_receiver = None
         if message.payload:
             _L().debug('connect to prefix: %s', uuid_)
+            client.prefix = prefix
+            # Identifies connection, e.g., to invalidate cached properties.
+            client.session = getattr(client, 'session', 0) + 1
             client.call = ft.partial(wait_for_result, client, 'call', prefix)
             client.property = ft.partial(wait_for_result, client, 'property',
                                          prefix)
+            receiver = ft.partial(send_local, signals, '%s-%s' % (name, uuid_))
+            if local and add_local_receiver(prefix + '/signal', receiver):
+                _L().debug('receive signals in process: %s', uuid_)
+                client.local_receiver = (prefix + '/signal', receiver)
             client.connected.set()
         else:
             _L().debug('disconnect from prefix: %s', uuid_)
+            client.prefix = None
             client.call = None
             client.property = None
             client.connected.clear()
         return
 
-    try:
-        payload = jt.loads(message.payload.decode('utf-8'))
-    except Exception:
-        _L().debug('error decoding payload')
-        payload = message.payload
+    if type_ == 'snapshot':
+        uuid_, request_id = levels[1:]
+        snapshot_ids = getattr(client, 'snapshot_ids', set())
+        if request_id not in snapshot_ids:
+            # Requested by another client.
+            return
+        snapshot_ids.discard(request_id)
+        try:
+            payload = decode(message.payload)
+        except Exception:
+            _L().debug('error decoding snapshot', exc_info=True)
+            return
+        # Most recent payload of each retained signal.
+        payloads = payload.items() if isinstance(payload, dict) else []
+    else:
+        uuid_, signalname = levels[1:]
+        local_receiver = getattr(client, 'local_receiver', None)
+        if signalname == SNAPSHOT:
+            # Snapshot without correlation ID, i.e., requested by another
+            # client.
+            return
+        elif (local_receiver is not None and
+              local_receiver[0] == '/%s/%s/signal' % (name, uuid_)):
+            # Signals are received directly (see `send_local()`), so skip
+            # decoding the MQTT copy.
+            return
+
+        try:
+            payload = decode(message.payload)
+        except Exception:
+            _L().debug('error decoding payload')
+            payload = message.payload
+
+        if payload is None:
+            # Retained message cleared.
+            return
+        payloads = [(signalname, payload)]
+    for signalname, payload in payloads:
+        signal = signals.signal(signalname)
+        for sample in unpack_samples(payload):
+            signal.send('%s-%s' % (name, uuid_), **sample)
+
+
+def request_snapshot(client):
+    '''
+    Request a snapshot of the most recent payload of each retained signal of
+    the connected device (see ``retain`` argument of
+    :func:`dropbot_monitor.blinker_mqtt.bind`).
+
+    The reply is published to a topic specific to the request, and its
+    payloads are sent to the corresponding signals by :func:`on_message`.
+
+    Parameters
+    ----------
+    client : paho.mqtt.client.Client
+        Client connected to a device (see :func:`on_message`).
+
+    Returns
+    -------
+    str
+        Correlation ID of request.
+    '''
+    request_id = uuid.uuid4().hex
+    if not hasattr(client, 'snapshot_ids'):
+        client.snapshot_ids = set()
+    client.snapshot_ids.add(request_id)
+    client.publish('%s/send-signal/%s' % (client.prefix, SNAPSHOT),
+                   payload=encode({'__id__': request_id}))
+    return request_id
+
 
-    match = cre_topic.match(message.topic)
-    if match:
-        uuid_, signalname = match.groups()
-        signals.signal(signalname).send('%s-%s' % (name, uuid_), **payload)
+def send_local(signals, sender, signalname, payload):
+    '''
+    Send signal received directly from a namespace bound in this process.
+    '''
+    signals.signal(signalname).send(sender, **payload)
 
 
 def on_connect(name, client, userdata, flags, rc):
@@ -108,40 +223,525 @@ def get_client(name, signals, *args, **kwargs):
     return client
 
 
-class MqttProxy:
+class Batch(object):
+    '''
+    Collect method calls and property reads/writes to send to a remote object
+    in a single ``batch`` request.
+
+    Requests are executed in order by the bridge and ``results`` is set to the
+    list of corresponding results, where the result of each failed request is
+    a :class:`dropbot_monitor.mqtt_rpc.RemoteError` instance.
+
+    Example
+    -------
+
+    >>> with proxy.batch() as batch:
+    ...     batch.property('voltage')
+    ...     batch.property('frequency')
+    ...     batch.call('measure_capacitance')
+    >>> voltage, frequency, capacitance = batch.results
+
+    In ``async_`` mode, ``results`` is a future:
+
+    >>> voltage, frequency, capacitance = await batch.results
+    '''
+    def __init__(self, proxy):
+        self.proxy = proxy
+        self.requests = []
+        self.results = None
+
+    def call(self, name, *args, **kwargs):
+        '''
+        Returns
+        -------
+        int
+            Index of request in batch.
+        '''
+        self.requests.append({'verb': 'call', 'name': name, 'args': args,
+                              'kwargs': kwargs})
+        return len(self.requests) - 1
+
+    def property(self, name, *args):
+        '''
+        Read property or, if a value is specified, write property.
+
+        Returns
+        -------
+        int
+            Index of request in batch.
+        '''
+        self.requests.append({'verb': 'property', 'name': name,
+                              'args': args})
+        return len(self.requests) - 1
+
+    def send(self, timeout=None, priority=None):
+        '''
+        Send batched requests.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            Seconds to wait for reply (default: timeout of proxy).
+        priority : str, optional
+            Priority of batch request (see
+            :data:`dropbot_monitor.mqtt_rpc.PRIORITIES`).
+
+        Returns
+        -------
+        list or asyncio.Future
+            Results of batched requests (future in ``async_`` mode).
+        '''
+        kwargs = {'__priority__': priority}
+        if timeout is not None:
+            kwargs['__timeout__'] = timeout
+        self.results = self.proxy._request('batch', 'batch', *self.requests,
+                                           **kwargs)
+        return self.results
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.send()
+
+
+class LoopThread(object):
+    '''
+    Event loop running in a background (daemon) thread.
+
+    Coroutines may be run to completion from any other thread (see
+    :meth:`run`), including from threads running an event loop of their own,
+    e.g., a Jupyter kernel.
+
+    Parameters
+    ----------
+    name : str, optional
+        Name of thread.
+    '''
+    def __init__(self, name='mqtt-proxy-loop'):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name=name)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_forever()
+            # Cancel coroutines still running (e.g., waiting for a reply), so
+            # threads waiting in `run()` do not block forever.
+            all_tasks = (getattr(asyncio, 'all_tasks', None) or
+                         asyncio.Task.all_tasks)
+            tasks = [task for task in all_tasks(self.loop) if not task.done()]
+            for task in tasks:
+                task.cancel()
+            if tasks:
+                self.loop.run_until_complete(asyncio.gather(
+                    *tasks, return_exceptions=True))
+        finally:
+            self.loop.close()
+            _L().debug('closed event loop')
+
+    def run(self, coroutine):
+        '''
+        Run coroutine in event loop thread and wait for result.
+
+        Returns
+        -------
+        object
+            Result of coroutine.
+
+        Raises
+        ------
+        RuntimeError
+            If called from the event loop thread (i.e., would never return).
+        concurrent.futures.CancelledError
+            If event loop is stopped before coroutine completes.
+        '''
+        if threading.current_thread() is self._thread:
+            coroutine.close()
+            raise RuntimeError('Cannot wait for coroutine in its own event '
+                               'loop thread.')
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    def stop(self):
+        '''
+        Stop event loop and wait for thread to exit.
+
+        Coroutines still running are cancelled.
+        '''
+        if self._thread.is_alive():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            if threading.current_thread() is not self._thread:
+                self._thread.join()
+
+
+_loop_thread_lock = threading.Lock()
+
+
+def get_loop_thread(client):
+    '''
+    Parameters
+    ----------
+    client : paho.mqtt.client.Client
+
+    Returns
+    -------
+    LoopThread
+        Event loop thread of synchronous proxies using client (started on
+        first use).
+    '''
+    loop_thread = getattr(client, '_loop_thread', None)
+    if loop_thread is None:
+        with _loop_thread_lock:
+            loop_thread = getattr(client, '_loop_thread', None)
+            if loop_thread is None:
+                loop_thread = LoopThread()
+                client._loop_thread = loop_thread
+    return loop_thread
+
+
+class PropertyCache(object):
+    '''
+    Read-through cache of remote property values.
+
+    Entries are invalidated:
+
+     - by local writes to the respective property;
+     - by any method call or batch request (except ``IMMUTABLE`` entries);
+     - by signals listed in ``invalidated_by``;
+     - when (re)connected to a device (all entries).
+
+    Parameters
+    ----------
+    policies : dict
+        Mapping from property name to either :data:`IMMUTABLE` or a
+        time-to-live in seconds.
+    invalidated_by : dict, optional
+        Mapping from signal name to names of cached properties invalidated by
+        the signal (default: :data:`INVALIDATED_BY`).
+    '''
+    MISSING = object()
+
+    def __init__(self, policies, invalidated_by=None):
+        self.policies = dict(policies)
+        self.invalidated_by = dict(INVALIDATED_BY if invalidated_by is None
+                                   else invalidated_by)
+        self.generation = 0
+        self._lock = threading.Lock()
+        self._session = None
+        # Mapping from property name to `(value, expiry time)`.
+        self._values = {}
+        self._receivers = []
+
+    def bind(self, signals):
+        '''
+        Invalidate entries when corresponding signals are received.
+
+        Parameters
+        ----------
+        signals : blinker.Namespace
+        '''
+        for signal_name, names in self.invalidated_by.items():
+            receiver = ft.partial(lambda names, sender, **kwargs:
+                                  self.invalidate(*names), names)
+            # Keep reference to receiver since signals hold weak references.
+            self._receivers.append(receiver)
+            signals.signal(signal_name).connect(receiver)
+
+    def get(self, session, name):
+        '''
+        Parameters
+        ----------
+        session : int
+            Connection identifier, i.e., ``client.session``.
+        name : str
+            Property name.
+
+        Returns
+        -------
+        object
+            Cached value, or ``PropertyCache.MISSING``.
+        '''
+        with self._lock:
+            if session != self._session:
+                return self.MISSING
+            value, expires = self._values.get(name, (self.MISSING, None))
+            if expires is not None and time.time() > expires:
+                del self._values[name]
+                return self.MISSING
+            return value
+
+    def set(self, session, name, value, generation):
+        '''
+        Store value of property read during connection ``session``.
+
+        Value is discarded if any entries were invalidated since
+        ``generation``, i.e., while the value was being read.
+        '''
+        policy = self.policies[name]
+        expires = None if policy == IMMUTABLE else time.time() + policy
+        with self._lock:
+            if session != self._session:
+                self._values.clear()
+                self._session = session
+            elif generation != self.generation:
+                return
+            self._values[name] = (value, expires)
+
+    def invalidate(self, *names):
+        '''
+        Invalidate specified entries, or all entries except ``IMMUTABLE``
+        entries if no names are specified.
+        '''
+        with self._lock:
+            self.generation += 1
+            if not names:
+                names = [k for k in self._values
+                         if self.policies[k] != IMMUTABLE]
+            for name in names:
+                self._values.pop(name, None)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._values.clear()
+
+
+class RemoteProperty(object):
+    '''
+    Descriptor which reads/writes the property with the same name on the
+    remote object.
+    '''
+    def __init__(self, name, doc=None):
+        self.name = name
+        self.__doc__ = doc
+
+    def __get__(self, proxy, owner=None):
+        if proxy is None:
+            return self
+        return proxy._get_property(self.name)
+
+    def __set__(self, proxy, value):
+        proxy._request('property', self.name, value)
+
+
+def remote_method(name, method):
+    '''
+    Parameters
+    ----------
+    name : str
+        Name of remote method.
+    method : function
+        Method of the remote object class (name, docstring, and signature are
+        copied).
+
+    Returns
+    -------
+    function
+        Proxy method which calls the remote method.
+    '''
+    @ft.wraps(method)
+    def _wrapped(self, *args, **kwargs):
+        return self._request('call', name, *args, **kwargs)
+    _wrapped.__doc__ = method.__doc__
+    return _wrapped
+
+
+_proxy_types = {}
+_proxy_types_lock = threading.Lock()
+
+
+def proxy_type(cls, async_=False, base=None):
     '''
     Inspect class type to extract properties and methods.
 
-    Corresponding attributes are added to each instance, which perform the
+    A subclass of ``base`` is generated with a corresponding
+    :class:`RemoteProperty` descriptor for each property and a proxy method
+    for each method.  Generated types are memoized, i.e., each class is only
+    inspected once.
+
+    Parameters
+    ----------
+    cls : class
+        Class type from which to extract properties and methods to expose.
+    async_ : bool, optional
+        If ``True``, remote calls return futures.
+    base : class, optional
+        Proxy base class (default: :class:`MqttProxy`).
+
+    Returns
+    -------
+    type
+        Proxy type.
+    '''
+    if base is None:
+        base = MqttProxy
+    key = (base, cls, async_)
+    type_ = _proxy_types.get(key)
+    if type_ is not None:
+        return type_
+
+    with _proxy_types_lock:
+        if key in _proxy_types:
+            return _proxy_types[key]
+        namespace = {'cls': cls, 'async_': async_}
+        properties = set()
+        for k in dir(cls):
+            if k.startswith('_'):
+                # Private and special attributes are not exposed by bridge.
+                continue
+            elif hasattr(base, k) or k in namespace:
+                _L().debug('`%s.%s` not exposed (name used by `%s`)',
+                           cls.__name__, k, base.__name__)
+                continue
+            attr = getattr(cls, k)
+            if type(attr) is property:
+                properties.add(k)
+                namespace[k] = RemoteProperty(k, attr.__doc__)
+            elif inspect.isfunction(attr) or inspect.ismethod(attr):
+                namespace[k] = remote_method(k, attr)
+        namespace['_properties'] = frozenset(properties)
+        type_ = type(str('%s[%s%s]' % (base.__name__, cls.__name__,
+                                       ', async' if async_ else '')),
+                     (base, ), namespace)
+        _proxy_types[key] = type_
+    return type_
+
+
+class MqttProxy(object):
+    '''
+    Proxy exposing the properties and methods of a class through MQTT.
+
+    Constructing a proxy returns an instance of the type generated (once) for
+    the class by :func:`proxy_type`, with attributes that perform the
     respective remote MQTT calls.
+
+    Each request is published as soon as the corresponding attribute is
+    accessed (or method is called), and replies are matched by correlation ID.
+    In ``async_`` mode, this allows many calls (including calls to the same
+    method) to be pipelined, e.g.:
+
+    >>> futures = [aproxy.measure_voltage() for i in range(10)]
+    >>> voltages = await asyncio.gather(*futures)
+
+    If ``timeout`` is set, each request fails with
+    :class:`asyncio.TimeoutError` if no reply is received within ``timeout``
+    seconds.  The timeout of a single method call may be set using the
+    reserved ``__timeout__`` keyword argument, e.g.:
+
+    >>> proxy.measure_voltage(__timeout__=2)
+
+    Similarly, the priority of a single method call may be set using the
+    reserved ``__priority__`` keyword argument, e.g.:
+
+    >>> proxy.update_state(hv_output_enabled=False, __priority__='high')
+
+    Property values may optionally be cached, e.g.:
+
+    >>> proxy = MqttProxy(cls, client, cache={'voltage': 0.5,
+    ...                                       'number_of_channels': IMMUTABLE})
+
+    See :class:`PropertyCache`.  If ``cache=True``, properties in
+    :data:`DEFAULT_CACHE_POLICIES` are cached.
+
+    If ``codec`` is set (e.g., ``msgpack``), replies are requested in the
+    corresponding content type, falling back to JSON if the bridge does not
+    support it (see :mod:`dropbot_monitor.codec`).
+
+    Requests of a synchronous proxy (i.e., not ``async_``) are run in an
+    event loop running in a background thread, shared by the synchronous
+    proxies of a client (see :func:`get_loop_thread`) and stopped by
+    ``__stop__()`` (e.g., on exiting a ``with`` block).  Each call waits for
+    the request to complete in that loop, so a synchronous proxy may be used
+    from any number of threads at once, including from threads running an
+    event loop of their own.
     '''
-    def __init__(self, cls, client, async_=False):
-        def wrapper(f):
-            if async_:
-                return f
-            else:
-                loop = asyncio.get_event_loop()
-                return loop.run_until_complete(f)
-
-        super(MqttProxy, self).__setattr__('async_', async_)
-        super(MqttProxy, self).__setattr__('_wrapper', wrapper)
-        super(MqttProxy, self).__setattr__('cls', cls)
+    def __new__(proxy_cls, cls, client, async_=False, *args, **kwargs):
+        if 'cls' not in proxy_cls.__dict__:
+            proxy_cls = proxy_type(cls, async_, proxy_cls)
+        return super(MqttProxy, proxy_cls).__new__(proxy_cls)
+
+    def __init__(self, cls, client, async_=False, timeout=None, cache=None,
+                 codec=None):
+        super(MqttProxy, self).__setattr__('__timeout__', timeout)
+        super(MqttProxy, self).__setattr__('__accept__',
+                                           None if codec is None else [codec])
+        if cache is True:
+            cache = PropertyCache(DEFAULT_CACHE_POLICIES)
+        elif isinstance(cache, dict):
+            cache = PropertyCache(cache)
+        if cache is not None and hasattr(client, 'signals'):
+            cache.bind(client.signals)
+        super(MqttProxy, self).__setattr__('__cache__', cache)
         super(MqttProxy, self).__setattr__('__client__', client)
-        super(MqttProxy, self).__setattr__('_properties',
-                                           {k for k in dir(self.cls)
-                                            if type(getattr(self.cls, k))
-                                            is property})
-
-        for k in dir(self.cls):
-            attr = getattr(self.cls, k)
-            if inspect.isfunction(attr) or inspect.ismethod(attr):
-                def get_wrapped(k, attr):
-                    @ft.wraps(attr)
-                    def _wrapped(*args, **kwargs):
-                        return self._wrapper(client.call(k, *args, **kwargs))
-                    _wrapped.__doc__ = attr.__doc__
-                    return _wrapped
-                super(MqttProxy, self).__setattr__(k, get_wrapped(k, attr))
+
+    def _request(self, verb, name, *args, **kwargs):
+        '''
+        Publish request to remote object.
+
+        Returns
+        -------
+        asyncio.Future or object
+            In ``async_`` mode, future resolved with the result of the
+            request; otherwise, the result of the request.
+        '''
+        client = self.__client__
+        cache = self.__cache__
+        if cache is not None:
+            if verb != 'property':
+                cache.invalidate()
+            elif args:
+                cache.invalidate(name)
+        kwargs.setdefault('__timeout__', self.__timeout__)
+        kwargs.setdefault('__accept__', self.__accept__)
+        if self.async_:
+            return send_request(client, verb, client.prefix, name, *args,
+                                **kwargs)
+        coroutine = wait_for_result(client, verb, client.prefix, name, *args,
+                                    **kwargs)
+        return get_loop_thread(client).run(coroutine)
+
+    def _get_property(self, name):
+        '''
+        Read remote property value (through cache, if enabled).
+        '''
+        cache = self.__cache__
+        if cache is None or name not in cache.policies:
+            return self._request('property', name)
+
+        session = getattr(self.__client__, 'session', None)
+        value = cache.get(session, name)
+        if value is not cache.MISSING:
+            if not self.async_:
+                return value
+            future = asyncio.Future()
+            future.set_result(value)
+            return future
+
+        generation = cache.generation
+        if not self.async_:
+            value = self._request('property', name)
+            cache.set(session, name, value, generation)
+            return value
+
+        def on_done(future):
+            if not future.cancelled() and future.exception() is None:
+                cache.set(session, name, future.result(), generation)
+
+        future = self._request('property', name)
+        future.add_done_callback(on_done)
+        return future
+
+    def batch(self):
+        '''
+        Returns
+        -------
+        Batch
+            Collects requests to send to remote object in a single message.
+        '''
+        return Batch(self)
 
     @classmethod
     def from_uri(self, cls, name, host, *args, **kwargs):
@@ -156,6 +756,14 @@ class MqttProxy:
             subscribe to ``/dropbot/+/#``.
         host : str
             Hostname to which MQTT client should connect, e.g., ``localhost``.
+        async_ : bool, optional
+            If ``True``, remote calls return futures.
+        timeout : float, optional
+            Default seconds to wait for the reply to each request.
+        cache : bool or dict or PropertyCache, optional
+            Property cache policies (see :class:`MqttProxy`).
+        codec : str, optional
+            Content type requested for replies, e.g., ``msgpack``.
         *args, **kwargs
             Additional parameters passed to MQTT ``Client`` constructor.
 
@@ -165,32 +773,41 @@ class MqttProxy:
             Proxy to object exposed through MQTT.
         '''
         async_ = kwargs.pop('async_', False)
+        timeout = kwargs.pop('timeout', None)
+        cache = kwargs.pop('cache', None)
+        codec = kwargs.pop('codec', None)
         signals = blinker.Namespace()
         client = get_client(name, signals, *args, **kwargs)
         client.connect_async(host)
         client.loop_start()
         client.signals = signals
         client.connected.wait()
-        proxy = self(cls, client, async_=async_)
+        proxy = self(cls, client, async_=async_, timeout=timeout,
+                     cache=cache, codec=codec)
         super(MqttProxy, proxy).__setattr__('_owns_client', True)
         return proxy
 
-    def __setattr__(self, name, value):
-        '''
-        Set attribute on proxy object if applicable.
-
-        Otherwise, set on local object.
-        '''
-        if name not in self._properties:
-            return super(MqttProxy, self).__setattr__(name, value)
-        else:
-            return self._wrapper(self.__client__.property(name, value))
-
     def __getattr__(self, name):
         '''
         Get attribute from remote object through proxy.
+
+        Only called for names which are not properties of the proxied class,
+        since properties are handled by :class:`RemoteProperty` descriptors.
+
+        Raises
+        ------
+        AttributeError
+            If name is private (i.e., ``_``-prefixed), or (for a synchronous
+            proxy) if the remote object has no such property, so that
+            :func:`hasattr` and :func:`getattr` with a default behave as for
+            a local object.
         '''
-        return self._wrapper(self.__client__.property(name))
+        if name.startswith('_'):
+            raise AttributeError(name)
+        try:
+            return self._get_property(name)
+        except RemoteAttributeError:
+            raise AttributeError(name)
 
     def __dir__(self):
         return dir(self.cls)
@@ -199,6 +816,13 @@ class MqttProxy:
         self.__client__.disconnect()
         self.__client__.loop_stop()
         _L().debug('stopped client loop')
+        # No reply may arrive anymore; cancel pending requests (before their
+        # event loop is stopped).
+        get_engine(self.__client__).detach()
+        loop_thread = getattr(self.__client__, '_loop_thread', None)
+        if loop_thread is not None:
+            loop_thread.stop()
+            del self.__client__._loop_thread
 
     def __start__(self):
         self.__client__.loop_start()
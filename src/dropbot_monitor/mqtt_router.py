@@ -0,0 +1,217 @@
+'''
+Route MQTT topics to handlers through a trie of topic levels.
+
+Topics are split on ``/`` once and matched level by level against
+registered topic filters, so the cost of routing a message depends on the
+depth of its topic rather than the number of registered filters.  Routes of
+recently seen topics are memoized, so routing a topic seen before (e.g., a
+signal published at a high rate) is a single dictionary lookup.  Filters
+support the MQTT wildcards ``+`` (any single level) and ``#`` (any number of
+trailing levels, including none; must be the last level).
+'''
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+import threading
+
+
+__all__ = ['TopicRouter']
+
+
+class _Node(object):
+    __slots__ = ('children', 'handler', 'multi')
+
+    def __init__(self):
+        # Child nodes by topic level (including `+`).
+        self.children = {}
+        # Handler of filter ending at this node.
+        self.handler = None
+        # Handler of filter ending with `#` at this node.
+        self.multi = None
+
+
+class TopicRouter(object):
+    '''
+    Trie of MQTT topic filters.
+
+    Each match is returned as a ``(handler, levels)`` tuple, where ``levels``
+    is a tuple of the topic levels matched by the wildcards of the filter, in
+    order (the levels matched by a ``#`` wildcard are joined into a single
+    string).
+
+    When several filters match a topic, filters are compared level by level,
+    where an exact level takes precedence over ``+``, which takes precedence
+    over ``#``.
+
+    Example
+    -------
+
+    >>> router = TopicRouter()
+    >>> router.add('/dropbot/+/signal/+', 'signal')
+    >>> router.add('/dropbot/+/properties', 'properties')
+    >>> router.route('/dropbot/abc/signal/channels-updated')
+    ('signal', ('abc', 'channels-updated'))
+    >>> router.route('/dropbot/abc/result/voltage')
+    (None, None)
+    '''
+    #: Maximum number of memoized routes.
+    cache_size = 4096
+
+    def __init__(self):
+        self._root = _Node()
+        self._lock = threading.Lock()
+        self._count = 0
+        # Memoized routes, by topic.
+        self._routes = {}
+
+    def __len__(self):
+        return self._count
+
+    def add(self, topic_filter, handler):
+        '''
+        Add (or replace) handler for topic filter.
+
+        Parameters
+        ----------
+        topic_filter : str
+            MQTT topic filter, e.g., ``/dropbot/+/call/+``.
+        handler : object
+            Returned for matching topics, e.g., a callback.
+        '''
+        levels = topic_filter.split('/')
+        if '#' in levels[:-1]:
+            raise ValueError('`#` must be the last level of topic filter: `%s`'
+                             % topic_filter)
+        with self._lock:
+            node = self._root
+            for level in levels[:-1]:
+                node = node.children.setdefault(level, _Node())
+            if levels[-1] == '#':
+                added = node.multi is None
+                node.multi = handler
+            else:
+                node = node.children.setdefault(levels[-1], _Node())
+                added = node.handler is None
+                node.handler = handler
+            self._count += added
+            self._routes = {}
+
+    def remove(self, topic_filter):
+        '''
+        Remove handler for topic filter.
+
+        Raises
+        ------
+        KeyError
+            If no handler is registered for the topic filter.
+        '''
+        levels = topic_filter.split('/')
+        with self._lock:
+            path = [self._root]
+            multi = levels[-1] == '#'
+            if multi:
+                levels = levels[:-1]
+            for level in levels:
+                node = path[-1].children.get(level)
+                if node is None:
+                    raise KeyError(topic_filter)
+                path.append(node)
+            node = path[-1]
+            if (node.multi if multi else node.handler) is None:
+                raise KeyError(topic_filter)
+            if multi:
+                node.multi = None
+            else:
+                node.handler = None
+            self._count -= 1
+            self._routes = {}
+            # Prune empty nodes.
+            for parent, level, node in zip(reversed(path[:-1]),
+                                           reversed(levels),
+                                           reversed(path[1:])):
+                if node.children or node.handler is not None or \
+                        node.multi is not None:
+                    break
+                del parent.children[level]
+
+    def match(self, topic):
+        '''
+        Parameters
+        ----------
+        topic : str
+            Topic of received message.
+
+        Returns
+        -------
+        list
+            ``(handler, levels)`` tuple for each matching filter, in order of
+            precedence.
+        '''
+        levels = topic.split('/')
+        matches = []
+        self._match(self._root, levels, 0, (), matches)
+        return matches
+
+    def route(self, topic):
+        '''
+        Parameters
+        ----------
+        topic : str
+            Topic of received message.
+
+        Returns
+        -------
+        tuple
+            ``(handler, levels)`` of matching filter with the highest
+            precedence, or ``(None, None)`` if no filter matches.
+        '''
+        # Routes are reset (not cleared) when filters change, so a route
+        # computed concurrently is not memoized in the new table.
+        routes = self._routes
+        route = routes.get(topic)
+        if route is None:
+            route = self._route(topic)
+            if len(routes) >= self.cache_size:
+                routes.clear()
+            routes[topic] = route
+        return route
+
+    def _route(self, topic):
+        levels = topic.split('/')
+        node = self._root
+        wildcards = []
+        # Fast path: follow exact levels (or else `+`) without backtracking,
+        # which finds the match with the highest precedence (if any).
+        for level in levels:
+            children = node.children
+            child = children.get(level)
+            if child is None:
+                child = children.get('+')
+                if child is None or level[:1] == '$' and node is self._root:
+                    break
+                wildcards.append(level)
+            node = child
+        else:
+            if node.handler is not None:
+                return node.handler, tuple(wildcards)
+        matches = self.match(topic)
+        return matches[0] if matches else (None, None)
+
+    def _match(self, node, levels, i, wildcards, matches):
+        if i == len(levels):
+            if node.handler is not None:
+                matches.append((node.handler, wildcards))
+            if node.multi is not None:
+                # `#` also matches the parent level.
+                matches.append((node.multi, wildcards + ('', )))
+            return
+        level = levels[i]
+        child = node.children.get(level)
+        if child is not None:
+            self._match(child, levels, i + 1, wildcards, matches)
+        child = node.children.get('+')
+        # Topics starting with `$` are not matched by wildcards.
+        if child is not None and not (i == 0 and level.startswith('$')):
+            self._match(child, levels, i + 1, wildcards + (level, ), matches)
+        if node.multi is not None and not (i == 0 and level.startswith('$')):
+            matches.append((node.multi, wildcards +
+                            ('/'.join(levels[i:]), )))
@@ -0,0 +1,490 @@
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+from collections import Counter, deque
+import itertools as it
+import sys
+import threading
+import uuid
+
+from logging_helpers import _L
+
+from . import codec
+
+if sys.version_info[0] < 3:
+    import trollius as asyncio
+else:
+    import asyncio
+
+
+__all__ = ['PRIORITIES', 'RemoteAttributeError', 'RemoteError', 'RpcEngine',
+           'get_engine', 'is_request_id', 'send_request', 'result_topic']
+
+#: Request priority classes, from highest to lowest priority.
+PRIORITIES = ('high', 'normal', 'low')
+
+
+class RemoteError(Exception):
+    '''
+    Error raised by the remote end while handling a request.
+
+    Attributes
+    ----------
+    type : str
+        Name of the exception type raised by the remote end (if known), e.g.,
+        ``AttributeError``.
+    '''
+    def __init__(self, message, type_=None):
+        super(RemoteError, self).__init__(message)
+        self.type = type_
+
+
+class RemoteAttributeError(RemoteError, AttributeError):
+    '''
+    ``AttributeError`` raised by the remote end, e.g., since the remote
+    object has no such method or property.
+    '''
+    pass
+
+
+def remote_error(result):
+    '''
+    Parameters
+    ----------
+    result : dict
+        Error reply payload (see :func:`error_payload`).
+
+    Returns
+    -------
+    RemoteError
+        Exception matching the type of the remote exception, i.e.,
+        :class:`RemoteAttributeError` for an ``AttributeError``.
+    '''
+    type_ = result.get('__type__')
+    cls = RemoteAttributeError if type_ == 'AttributeError' else RemoteError
+    return cls(result['__error__'], type_)
+
+
+def is_request_id(request_id):
+    '''
+    Parameters
+    ----------
+    request_id : object
+        ``__id__`` field of a request payload.
+
+    Returns
+    -------
+    bool
+        ``True`` if ``request_id`` may be used as a correlation ID, i.e., is a
+        non-empty string which is a single MQTT topic level (no ``/``) without
+        wildcards (``+`` or ``#``).
+    '''
+    return (isinstance(request_id, type('')) and bool(request_id) and
+            not any(c in request_id for c in '/+#'))
+
+
+def result_topic(prefix, name, request_id=None):
+    '''
+    Parameters
+    ----------
+    prefix : str
+        Device topic prefix, e.g., ``/dropbot/<uuid>``.
+    name : str
+        Name of remote method or property.
+    request_id : str, optional
+        Correlation ID of request (see :func:`is_request_id`).
+
+    Returns
+    -------
+    str
+        Topic to which the result of the corresponding request is published,
+        i.e., ``<prefix>/result/<name>[/<request_id>]``.
+    '''
+    topic = '%s/result/%s' % (prefix, name)
+    if request_id is not None:
+        topic += '/' + request_id
+    return topic
+
+
+def decode_result(payload):
+    '''
+    Decode result payload.
+
+    Payloads encoded with a binary codec (i.e., with a content type header)
+    are decoded using the corresponding codec; otherwise, payload is decoded
+    as JSON.  Class instances are decoded for registered classes only (see
+    :func:`dropbot_monitor.codec.register_instance_type`).
+
+    Parameters
+    ----------
+    payload : bytes
+
+    Returns
+    -------
+    object
+        Decoded result.
+
+    Raises
+    ------
+    RemoteError
+        If payload reports an error raised by the remote end, i.e.,
+        ``{"__error__": <message>, "__type__": <exception type>}`` (see
+        :func:`remote_error`).
+    '''
+    data = codec.decode(payload)
+    if isinstance(data, dict) and '__error__' in data:
+        raise remote_error(data)
+    return data
+
+
+def decode_batch_result(payload):
+    '''
+    Decode result payload of ``batch`` request.
+
+    Parameters
+    ----------
+    payload : bytes
+
+    Returns
+    -------
+    list
+        Result of each request in batch, where the result of each failed
+        request is a :class:`RemoteError` instance.
+    '''
+    return [remote_error(result)
+            if isinstance(result, dict) and '__error__' in result else result
+            for result in decode_result(payload)]
+
+
+def error_payload(exception):
+    '''
+    Parameters
+    ----------
+    exception : Exception
+
+    Returns
+    -------
+    dict
+        Error reply payload, decoded as :class:`RemoteError` (or, e.g.,
+        :class:`RemoteAttributeError`; see :func:`remote_error`) by
+        :func:`decode_result`.
+    '''
+    type_ = type(exception).__name__
+    return {'__error__': '%s: %s' % (type_, exception), '__type__': type_}
+
+
+def _set_result(future, result):
+    if not future.done():
+        future.set_result(result)
+
+
+def _set_exception(future, exception):
+    if not future.done():
+        future.set_exception(exception)
+
+
+class RpcEngine(object):
+    '''
+    Persistent request/reply engine for remote calls over MQTT.
+
+    Each request is tagged with a correlation ID (the ``__id__`` field of the
+    request payload), which the bridge appends to the result topic, i.e.,
+    ``<prefix>/result/<name>/<id>``.  A single wildcard callback per prefix
+    resolves the future of the matching entry in the pending request table,
+    so no MQTT callbacks are added or removed per call.
+
+    Replies published by a bridge that does not echo correlation IDs (i.e.,
+    to ``<prefix>/result/<name>``) are matched to pending requests with the
+    same name in the order the requests were sent.
+
+    Clients may list the content types (see :mod:`dropbot_monitor.codec`)
+    accepted for replies, in order of preference, either per request or as
+    ``accept`` for all requests of the engine.  The list is sent as the
+    ``__accept__`` field of the request payload.
+
+    A request may be assigned one of the :data:`PRIORITIES` (sent as the
+    ``__priority__`` field of the request payload), e.g., ``high`` priority
+    requests are executed by the bridge ahead of any queued ``normal``
+    priority requests.
+
+    If a timeout is set (per request, or ``default_timeout`` for all requests
+    of the engine), it is sent as the ``__timeout__`` field of the request
+    payload so the bridge may skip requests the caller has already given up
+    on.  The timeout is relative to when the bridge receives the request, so
+    the clocks of the client and the bridge need not agree.  Expired requests
+    are removed from the pending table, their futures fail with
+    :class:`asyncio.TimeoutError`, and they are counted in
+    ``stats['expired']``.
+
+    Example
+    -------
+
+    >>> engine = get_engine(client)
+    >>> future = engine.request('property', '/dropbot/<uuid>', 'voltage')
+    >>> loop.run_until_complete(future)
+    '''
+    def __init__(self, client, default_timeout=None, accept=None):
+        self.client = client
+        self.default_timeout = default_timeout
+        self.accept = accept
+        self.stats = Counter()
+        self._lock = threading.Lock()
+        self._pending = {}
+        # Request IDs per `(prefix, name)`, in the order requests were sent.
+        self._order = {}
+        self._prefixes = set()
+        # Prefixes for which replies have been received with correlation IDs.
+        self._correlated = set()
+        # Unique ID prefix to ignore replies to other clients sharing a topic
+        # prefix.
+        self._id_prefix = uuid.uuid4().hex[:12]
+        self._ids = it.count()
+
+    @property
+    def pending_count(self):
+        return len(self._pending)
+
+    def attach(self, prefix):
+        '''
+        Attach result callback for the specified topic prefix (if necessary).
+
+        Parameters
+        ----------
+        prefix : str
+            Device topic prefix, e.g., ``/dropbot/<uuid>``.
+        '''
+        if prefix in self._prefixes:
+            return
+        with self._lock:
+            if prefix in self._prefixes:
+                return
+            for topic in (result_topic(prefix, '+', '+'),
+                          result_topic(prefix, '+')):
+                self.client.message_callback_add(topic, self._on_result)
+                self.client.subscribe(topic, qos=1)
+            self._prefixes.add(prefix)
+        _L().debug('attached callbacks to prefix: `%s`', prefix)
+
+    def resubscribe(self):
+        '''
+        Subscribe (again) to the result topics of each attached prefix.
+
+        Should be called whenever the client (re)connects to the broker,
+        since subscriptions are not restored on reconnect.
+        '''
+        with self._lock:
+            topics = [topic for prefix in sorted(self._prefixes)
+                      for topic in (result_topic(prefix, '+', '+'),
+                                    result_topic(prefix, '+'))]
+        if topics:
+            self.client.subscribe([(topic, 1) for topic in topics])
+
+    def detach(self):
+        '''
+        Detach all result callbacks and cancel pending requests.
+
+        Should be called before stopping the event loop of any pending
+        request, since futures are cancelled from their respective loop.
+        '''
+        with self._lock:
+            for prefix in self._prefixes:
+                self.client.message_callback_remove(result_topic(prefix, '+',
+                                                                 '+'))
+                self.client.message_callback_remove(result_topic(prefix,
+                                                                 '+'))
+            self._prefixes.clear()
+            pending = list(self._pending.values())
+            self._pending.clear()
+            self._order.clear()
+        for future, loop, key, verb in pending:
+            try:
+                loop.call_soon_threadsafe(future.cancel)
+            except RuntimeError:
+                # Event loop is closed.
+                pass
+
+    def request(self, verb, prefix, name, args=None, kwargs=None, loop=None,
+                timeout=None, accept=None, priority=None):
+        '''
+        Publish request and return future resolved by the matching reply.
+
+        Parameters
+        ----------
+        verb : str
+            Request type, e.g., ``call`` or ``property``.
+        prefix : str
+            Device topic prefix, e.g., ``/dropbot/<uuid>``.
+        name : str
+            Name of remote method or property.
+        args : tuple, optional
+        kwargs : dict, optional
+        loop : asyncio.AbstractEventLoop, optional
+            Event loop the returned future is bound to (default: current
+            event loop).
+        timeout : float, optional
+            Seconds to wait for reply (default: ``default_timeout``).
+        accept : list, optional
+            Content types accepted for reply, in order of preference
+            (default: ``accept``).
+        priority : str, optional
+            One of :data:`PRIORITIES` (default: ``normal``).
+
+        Returns
+        -------
+        asyncio.Future
+            Future resolved with the decoded result.
+        '''
+        if loop is None:
+            loop = asyncio.get_event_loop()
+        if timeout is None:
+            timeout = self.default_timeout
+        if accept is None:
+            accept = self.accept
+        self.attach(prefix)
+
+        request_id = '%s-%d' % (self._id_prefix, next(self._ids))
+        future = asyncio.Future(loop=loop)
+        key = (prefix, name)
+        with self._lock:
+            self._pending[request_id] = (future, loop, key, verb)
+            self._order.setdefault(key, deque()).append(request_id)
+        # Drop table entry if the future is cancelled before a reply arrives.
+        future.add_done_callback(lambda *args: self._discard(request_id))
+
+        request = {'args': args or tuple(), 'kwargs': kwargs or {},
+                   '__id__': request_id}
+        if accept:
+            request['__accept__'] = list(accept)
+        if priority is not None:
+            request['__priority__'] = priority
+        if timeout is not None:
+            request['__timeout__'] = timeout
+            expire = loop.call_later(timeout, self._expire, request_id)
+            future.add_done_callback(lambda *args: expire.cancel())
+        payload = codec.json_dumps(request)
+        try:
+            self.client.publish('%s/%s/%s' % (prefix, verb, name),
+                                payload=payload, qos=1)
+        except Exception:
+            self._discard(request_id)
+            raise
+        return future
+
+    def _expire(self, request_id):
+        with self._lock:
+            request = self._pop(request_id)
+        if request is not None:
+            self.stats['expired'] += 1
+            future, loop, key, verb = request
+            _L().debug('request expired: %s/%s (%s)', verb, key[1],
+                       request_id)
+            _set_exception(future, asyncio.TimeoutError('No reply to `%s` '
+                                                        'request `%s`' %
+                                                        (verb, key[1])))
+
+    def _discard(self, request_id):
+        with self._lock:
+            self._pop(request_id)
+
+    def _pop(self, request_id):
+        '''
+        Remove request from pending table.
+
+        Must be called with ``_lock`` held.
+        '''
+        request = self._pending.pop(request_id, None)
+        if request is not None:
+            key = request[2]
+            order = self._order[key]
+            # Replies typically arrive in order, i.e., head of queue.
+            order.remove(request_id)
+            if not order:
+                del self._order[key]
+        return request
+
+    def _on_result(self, client, userdata, message):
+        '''
+        Resolve pending request matching correlation ID of result topic.
+
+        Parameters
+        ----------
+        client : paho.mqtt.client.Client
+            The client instance for this callback
+        userdata
+            The private user data as set in Client() or userdata_set()
+        message : paho.mqtt.client.MQTTMessage
+            This is a class with members topic, payload, qos, retain.
+        '''
+        prefix, reply_to = message.topic.rsplit('/result/', 1)
+        name, _, request_id = reply_to.partition('/')
+        with self._lock:
+            if request_id:
+                self._correlated.add(prefix)
+                request = self._pop(request_id)
+            elif prefix not in self._correlated:
+                # No correlation ID in topic (i.e., bridge does not echo
+                # IDs); match the oldest pending request with the same name.
+                order = self._order.get((prefix, name))
+                request = self._pop(order[0]) if order else None
+            else:
+                # Reply to a request sent by a client without IDs.
+                request = None
+        if request is None:
+            # Reply to a request from another client (or an expired request).
+            return
+        future, loop, key, verb = request
+        try:
+            if verb == 'batch':
+                result = decode_batch_result(message.payload)
+            else:
+                result = decode_result(message.payload)
+        except Exception as exception:
+            loop.call_soon_threadsafe(_set_exception, future, exception)
+        else:
+            loop.call_soon_threadsafe(_set_result, future, result)
+
+
+_engine_lock = threading.Lock()
+
+
+def get_engine(client):
+    '''
+    Parameters
+    ----------
+    client : paho.mqtt.client.Client
+
+    Returns
+    -------
+    RpcEngine
+        Request engine bound to client (created on first use).
+    '''
+    engine = getattr(client, '_rpc_engine', None)
+    if engine is None:
+        with _engine_lock:
+            engine = getattr(client, '_rpc_engine', None)
+            if engine is None:
+                engine = RpcEngine(client)
+                client._rpc_engine = engine
+    return engine
+
+
+def send_request(client, verb, prefix, name, *args, **kwargs):
+    '''
+    Publish request through the engine bound to client.
+
+    The reserved keyword arguments ``__timeout__`` (seconds), ``__accept__``
+    (list of content types), and ``__priority__`` (see :data:`PRIORITIES`)
+    set the deadline of the request, the content types accepted for the
+    reply, and the priority of the request, respectively; all other arguments
+    are passed to the remote method.
+
+    Returns
+    -------
+    asyncio.Future
+        Future resolved with the decoded result.
+    '''
+    timeout = kwargs.pop('__timeout__', None)
+    accept = kwargs.pop('__accept__', None)
+    priority = kwargs.pop('__priority__', None)
+    return get_engine(client).request(verb, prefix, name, args, kwargs,
+                                      timeout=timeout, accept=accept,
+                                      priority=priority)